@@ -0,0 +1,81 @@
+# import time regression benchmark
+# each statement is timed in fresh interpreters, which also check no heavy dependency was loaded by it
+# python benchmarks/import_time.py [--repeat 5] [--max-seconds 1.0]
+# exits with 1 if a heavy module got loaded or the median time of a statement exceeds --max-seconds
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+statements = [
+    "import pyvicar",
+    "from pyvicar.case import Case",
+    "import pyvicar.tools.mpi",
+    "import pyvicar.tools.post",
+    "import pyvicar.tools.study",
+]
+
+# loaded on first use only
+heavy_modules = [
+    "pyvista",
+    "vtkmodules",
+    "pandas",
+    "matplotlib",
+    "scipy",
+    "h5py",
+    "trimesh",
+    "stl",
+    "ffmpeg",
+    "mpi4py",
+]
+
+_probe = """
+import sys, time, json
+t = time.perf_counter()
+{statement}
+dt = time.perf_counter() - t
+print(json.dumps({{"time": dt, "loaded": [m for m in {heavy} if m in sys.modules]}}))
+"""
+
+
+def measure(statement, repeat):
+    code = _probe.format(statement=statement, heavy=heavy_modules)
+    times = []
+    loaded = set()
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(result["time"])
+        loaded.update(result["loaded"])
+    return times, sorted(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pyvicar import time benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    failed = False
+    for statement in statements:
+        times, loaded = measure(statement, args.repeat)
+        median = statistics.median(times)
+        status = "ok"
+        if loaded:
+            status = f"loaded {loaded}"
+            failed = True
+        if args.max_seconds is not None and median > args.max_seconds:
+            status = f"slower than {args.max_seconds} s"
+            failed = True
+        print(
+            f"{statement:<36} median {median:.3f} s, min {min(times):.3f} s, {status}"
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
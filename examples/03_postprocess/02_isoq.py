@@ -70,6 +70,11 @@ mpi.print_elapsed_time()
 
 # mpi is not needed to be imported, get_isoq_video has mpi support internally,
 # simply mpirun -np x python xxx.py will
+# without mpirun, python xxx.py runs serially, PYVICAR_NPROCS=x python xxx.py forks x local procs
+# at the first dispatch (PYVICAR_BACKEND=local for one per core), the script after it runs on every proc
+# PYVICAR_PROFILE=1 prints the read/compute/render/encode seconds of every rank at the end of the frames
+# and at print_elapsed_time, PYVICAR_TRACE=trace.json also writes a timeline for ui.perfetto.dev,
+# wrap own steps with mpi.span("name") to add them
 
 # c.dump.vtm is what the solver dumps, use c.dump.vtr/vtk if one has compressed (example 4)
 # c.dump.marker is optional, it will not plot bodies if not specified or not exists
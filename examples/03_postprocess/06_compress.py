@@ -23,6 +23,23 @@ c.dump.vtm.to_binary()
 # # or to a single unstruc vtk, but may take even larger space
 # c.dump.vtm.to_vtks(keep_vtms=True)
 
+# # or stitch to a single vtr, streaming=True reads one sub vtr at a time
+# # with bounded memory and writes an uncompressed raw vtr,
+# # the block partition is detected from the first vtm and stored for later frames
+# c.dump.vtm.to_vtrs(streaming=True)
+
+# # lods writes 2x/4x/8x cell averaged previews next to each frame,
+# # read back by c.dump.vtr.lod(4) for quick looks
+# c.dump.vtm.to_vtrs(lods=(2, 4, 8))
+
+# # lossy storage per field, the max/rms error introduced is logged for each frame
+# from pyvicar.tools.precision import Precision
+# c.dump.vtm.to_vtrs(
+#     precision={"VEL": Precision(dtype="float32"), "P": Precision(atol=1e-6)},
+#     compressor="lz4",
+# )
+
 mpi.print_elapsed_time()
 
-# similar, mpirun -np x python compress.py to compress in parallel
+# similar, mpirun -np x python compress.py to compress in parallel,
+# or PYVICAR_NPROCS=x python compress.py to use x local cores, python compress.py alone runs serially
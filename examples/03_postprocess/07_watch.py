@@ -0,0 +1,30 @@
+import pyvicar
+import pyvicar.tools.mpi as mpi
+
+# 7. watch
+# this script runs next to the solver and compresses each vtm frame once it is complete
+
+# use at least v1.0.2 if only for postprocess because in lower version
+# instantiating Case(...) alone would truncate existing input files
+pyvicar.assert_api_version("1.0.2", "1.1.0")
+
+Case = pyvicar.import_case("~/opt/ViCar3D/versions/common")
+
+c = Case("tut_sphere")
+
+# a frame is converted when the vtm and all its sub vtrs are written and
+# have not changed for stable_time seconds, polled every interval seconds
+# keep_vtms=False removes the original vtm trees after conversion
+# idle_timeout stops the watcher after no new frame for this long, e.g. after the solver ends
+c.dump.vtm.watch(
+    to="vtr",
+    interval=60,
+    stable_time=30,
+    idle_timeout=3600,
+    keep_vtms=False,
+    streaming=True,
+)
+
+mpi.print_elapsed_time()
+
+# similar, mpirun -np x python watch.py to convert the ready frames in parallel
@@ -13,7 +13,9 @@ codes = sys.argv[2:]
 pf = mgr.postlib.import_func(job)
 
 if pf.mpi_async:
-    codes = mpi.dispatch(codes)
+    # timings of the previous run of this job balance the split
+    record = mpi.CostRecord(f"post.{job}.cost.json")
+    codes = record.timed(mpi.dispatch(codes, cost=record, method="lpt"))
     log.log_host(f"Job {job} supports MPI Async parallel")
     mpi.set_async()
 else:
@@ -1,9 +1,24 @@
-from . import case
-from . import file
-from . import geometry
-from . import grid
-from . import tools
-from .addons_importer import import_addons, api_version, assert_api_version
-from .case.case_importer import import_case
+import importlib
 
 __all__ = ["case", "file", "geometry", "grid", "tools"]
+
+# subpackages and the importers are loaded on first access, so that import pyvicar stays cheap
+_lazy_attrs = {
+    "import_addons": "addons_importer",
+    "api_version": "addons_importer",
+    "assert_api_version": "addons_importer",
+    "import_case": "case.case_importer",
+}
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    if name in _lazy_attrs:
+        module = importlib.import_module(f".{_lazy_attrs[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__ + list(_lazy_attrs))
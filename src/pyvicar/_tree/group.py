@@ -175,8 +175,8 @@ class List(MutableSequence, Container):
     def __repr__(self):
         return f"List({repr(self._childrenlist)})"
 
-    def mpi_dispatch(self):
-        return mpi.dispatch_sequence(self, self._startidx)
+    def mpi_dispatch(self, cost=None, method="contiguous"):
+        return mpi.dispatch_sequence(self, self._startidx, cost=cost, method=method)
 
 
 # Dict contains dynamic children that can be accessed as a dict
@@ -1 +1,2 @@
 from .optional import Optional
+from .lazy import lazy_import, LazyModule
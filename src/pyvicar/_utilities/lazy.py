@@ -0,0 +1,31 @@
+import importlib
+from types import ModuleType
+
+
+# stands in for a heavy module and imports it on the first attribute access,
+# e.g. pv = lazy_import("pyvista") in place of import pyvista as pv
+class LazyModule(ModuleType):
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"LazyModule({self.__name__}, {state})"
+
+
+def lazy_import(name):
+    return LazyModule(name)
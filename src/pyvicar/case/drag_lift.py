@@ -1,5 +1,5 @@
+from pyvicar._utilities import lazy_import
 import numpy as np
-import pandas as pd
 from pathlib import Path
 from pyvicar._utilities import Optional
 from pyvicar._tree import Group, Field, List
@@ -7,6 +7,8 @@ from pyvicar.file import Readable
 from pyvicar.file import Series
 from pyvicar.tools.post.time import proc_draglift
 
+pd = lazy_import("pandas")
+
 
 class DragLiftList(List, Readable, Optional):
     def __init__(self, case):
@@ -1,9 +1,11 @@
-import pyvista as pv
+from pyvicar._utilities import lazy_import
 from dataclasses import dataclass
 from pyvicar._tree import List
 from pyvicar.file import Readable, Series
 from pyvicar._utilities import Optional
 
+pv = lazy_import("pyvista")
+
 
 class MarkerList(List, Readable, Optional):
     def __init__(self, case):
@@ -1,4 +1,4 @@
-import pyvista as pv
+import numpy as np
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 from pyvicar._tree import List
@@ -10,9 +10,21 @@ from pyvicar.tools.vtk import (
     compress_to_vtr,
     create_ijs_from_forxy,
     compress_to_binary,
+    VTMLayout,
+    layout_path,
+    find_layout,
+    read_vtm_as_vtr,
+    read_vtk,
+    read_vtr,
+    read_vtr_geometry,
 )
+from pyvicar.tools.vtkxml import memmap_vtr
+from pyvicar.tools.fieldstore import FieldStore, create_field_store
+from pyvicar.tools.watch import DumpWatcher
+from pyvicar.tools.stats import StatsSeries, load_stats, stats_path
+from pyvicar.tools.probe import ProbeEngine, probe_frames
 import pyvicar.tools.log as log
-
+import pyvicar.tools.mpi as mpi
 
 class VTKListBase(List, Readable, Optional):
     def __init__(self, case):
@@ -69,10 +81,65 @@ class VTKListBase(List, Readable, Optional):
     def read(self):
         pass
 
+    @property
+    def h5_path(self):
+        return self._case.path / "FieldsFiles" / "fields.h5"
+
+    # chunked hdf5 time series of the structured frames, see create_field_store for kwargs
+    # calling it again appends the frames dumped since
+    def to_h5(self, path=None, **kwargs):
+        return create_field_store(
+            self, self.h5_path if path is None else path, **kwargs
+        )
+
+    # space/time hyperslabs without loading whole frames, e.g. store.slab("P", t=slice(0, 100), i=10)
+    def h5(self, path=None):
+        return FieldStore(self.h5_path if path is None else path)
+
+    # node coordinates of the structured frames
+    def grid(self):
+        raise TypeError(
+            f"{self.__class__.__name__} frames are not on a rectilinear grid"
+        )
+
+    # field time history at fixed probes, returns tstep [nt] and samples [nt, nprobe, ncomp]
+    # points: [nprobe, 3] trilinear between cell centers,
+    # or ijk: [nprobe, 3] cell indices or a case.probe.Nodes, in its layout with the first cell at base
+    def probe(self, field, points=None, ijk=None, base=1):
+        if (points is None) == (ijk is None):
+            raise ValueError(f"Specify either points or ijk for the probes")
+        if not self:
+            raise Exception(f"VTK dump list is not active now")
+
+        x, y, z = self.grid()
+        if points is not None:
+            engine = ProbeEngine.from_points(x, y, z, points)
+        else:
+            if hasattr(ijk, "ijk"):
+                ijk = ijk.ijk.value
+            shape = (x.shape[0] - 1, y.shape[0] - 1, z.shape[0] - 1)
+            engine = ProbeEngine.from_ijk(shape, ijk, base)
+
+        tstep = np.array([vtk.tstep for vtk in self], dtype=int)
+        return tstep, probe_frames(self, engine, field)
+
+    # time series of the fields.N.stats.json sidecars written by the conversions, no field file is opened
+    # e.g. clim=c.dump.vtr.stats().clim(lb.Field.vector("VEL")) for fixed color limits
+    def stats(self):
+        paths = [stats_path(vtk.path) for vtk in self]
+        frames = [load_stats(path) for path in paths if path.exists()]
+        if len(frames) != len(paths):
+            log.log_host(
+                f"Stats: {len(paths) - len(frames)} of {len(paths)} frames have no stats sidecar"
+            )
+        return StatsSeries(frames)
+
 
 class VTMList(VTKListBase):
     def __init__(self, case):
         VTKListBase.__init__(self, case)
+        # layout detected by the first to_pyvista without a stored one, False if not rectilinear
+        self._detected = None
 
     def _elemcheck(self, new):
         if not isinstance(new, (VTM, SampleVTM)):
@@ -81,9 +148,13 @@ class VTMList(VTKListBase):
             )
 
     def read(self):
-        self._read_impl("vtm", VTM, SampleVTM)
+        self._read_impl(
+            "vtm", lambda *args: VTM(*args, self), lambda *args: SampleVTM(*args, self)
+        )
 
-    def to_vtks(self, **kwargs):
+    # structured=True stitches by the layout index, npx, npy as in layout(),
+    # without them and a stored layout it is detected, or the points are merged if not on a xy partition
+    def to_vtks(self, npx=None, npy=None, structured=True, **kwargs):
         log.log_host(
             "Warning: VTK might be 130% space of the original multiblocked VTR if the output is still a full structured rectangular domain. Use to_vtrs(npx, npy) to compress down to 25%"
         )
@@ -92,20 +163,115 @@ class VTMList(VTKListBase):
                 "VTM Debug: test still converts real fields, but will not delete vtms. keep_vtms has been forced to True"
             )
             kwargs["keep_vtms"] = True
-        compress_to_vtk(self, **kwargs)
+        layout = self._vtk_layout(npx, npy) if structured else None
+        compress_to_vtk(self, layout=layout, structured=structured, **kwargs)
         self.read()
         self._case.dump.vtk.read()
 
-    def to_vtrs(self, npx, npy, **kwargs):
+    @property
+    def layout_path(self):
+        return layout_path(self._case.path / "FieldsFiles")
+
+    # block layout index of the case, computed once from the first vtm and reused for all frames
+    # the partition is detected from the blocks, npx, npy force a x-major partition instead
+    # source: the vtm to compute it from, the first one if not specified
+    def layout(self, npx=None, npy=None, source=None):
+        if (npx is None) != (npy is None):
+            raise ValueError(f"Specify both npx and npy, or neither to detect them")
+        ijs = None if npx is None else create_ijs_from_forxy(npx, npy)
+
+        path = self.layout_path
+        if path.exists():
+            layout = VTMLayout.load(path)
+            if ijs is None or ijs == layout.ijs:
+                return layout
+
+        if source is None:
+            if not self:
+                raise Exception(f"VTK dump list is not active now")
+            source = self._childrenlist[0]
+
+        if mpi.is_synchost_or_async():
+            log.log(f"VTM Layout: Creating {path} from {source.path}")
+            layout = VTMLayout.from_vtm(source, ijs)
+            layout.save(path)
+        mpi.barrier_or_async()
+
+        return VTMLayout.load(path)
+
+    def grid(self):
+        layout = self.layout()
+        return layout.x, layout.y, layout.z
+
+    # the stored or forced layout for the vtk stitching, None to let compress_to_vtk detect it
+    def _vtk_layout(self, npx, npy, source=None):
+        if npx is not None or self.layout_path.exists():
+            return self.layout(npx, npy, source)
+        return None
+
+    # layout to read a frame with, the stored one, else detected from the frame once for the whole list,
+    # None if the blocks are not on a rectilinear partition
+    def frame_layout(self, vtm):
+        layout = find_layout(self._case.path / "FieldsFiles")
+        if layout is not None:
+            return layout
+        if self._detected is None:
+            self._detected = detect_layout(vtm)
+            if self._detected is None:
+                self._detected = False
+        return self._detected if self._detected is not False else None
+
+    def to_vtrs(self, npx=None, npy=None, **kwargs):
         if is_test():
             log.log_host(
                 "VTM Debug: test still converts real fields, but will not delete vtms. keep_vtms has been forced to True"
             )
             kwargs["keep_vtms"] = True
-        compress_to_vtr(self, create_ijs_from_forxy(npx, npy), **kwargs)
+        compress_to_vtr(self, self.layout(npx, npy), **kwargs)
         self.read()
         self._case.dump.vtr.read()
 
+    # converts the frames while the solver is still dumping, see DumpWatcher
+    # to: "vtr", "vtk" or "binary", kwargs go to the compress function, e.g. keep_vtms=False
+    # idle_timeout: stop after no new frame for this many seconds, None to run until killed
+    def watch(
+        self,
+        to="vtr",
+        npx=None,
+        npy=None,
+        interval=60,
+        stable_time=30,
+        idle_timeout=None,
+        stop_f=None,
+        **kwargs,
+    ):
+        if is_test():
+            log.log_host(
+                "VTM Debug: test still converts real fields, but will not delete vtms or overwrite sub vtrs"
+            )
+            if to == "binary":
+                kwargs["inplace"] = False
+            else:
+                kwargs["keep_vtms"] = True
+
+        if to == "vtr":
+            convert = lambda vtms: compress_to_vtr(
+                vtms, self.layout(npx, npy, vtms[0]), **kwargs
+            )
+        elif to == "vtk":
+            convert = lambda vtms: compress_to_vtk(
+                vtms, layout=self._vtk_layout(npx, npy, vtms[0]), **kwargs
+            )
+        elif to == "binary":
+            convert = lambda vtms: compress_to_binary(vtms, **kwargs)
+        else:
+            raise ValueError(f"Expected to = vtr, vtk or binary, but encountered {to}")
+
+        DumpWatcher(self, convert, interval, stable_time).run(idle_timeout, stop_f)
+        self.read()
+        self._case.dump.vtr.read()
+        self._case.dump.vtk.read()
+
     def to_binary(self, **kwargs):
         if is_test():
             log.log_host(
@@ -130,9 +296,12 @@ class VTKList(VTKListBase):
         self._read_impl("vtk", VTK, SampleVTK)
 
 
+# lod: level of the coarse copies fields.N.lod{level}.vtr written by to_vtrs(lods=...), None for the full frames
 class VTRList(VTKListBase):
-    def __init__(self, case):
+
+    def __init__(self, case, lod=None):
         VTKListBase.__init__(self, case)
+        self._lod = lod
 
     def _elemcheck(self, new):
         if not isinstance(new, (VTR, SampleVTR)):
@@ -140,8 +309,27 @@ class VTRList(VTKListBase):
                 f"Expected a VTR object inside VTRList, but encountered {repr(new)}"
             )
 
+    @property
+    def level(self):
+        return self._lod
+
+    def grid(self):
+        if not self:
+            raise Exception(f"VTK dump list is not active now")
+        geometry = read_vtr_geometry(self._childrenlist[0].path)
+        return geometry.x, geometry.y, geometry.z
+
     def read(self):
-        self._read_impl("vtr", VTR, SampleVTR)
+        if self._lod is None:
+            self._read_impl("vtr", VTR, SampleVTR)
+        else:
+            self._read_impl(rf"lod{self._lod}\.vtr", VTR, SampleVTR)
+
+    # coarse preview frames, e.g. c.dump.vtr.lod(4), usable as vtks=... of the video generators
+    def lod(self, level):
+        lods = VTRList(self._case, level)
+        lods.read()
+        return lods
 
 
 class VTKBase(ABC):
@@ -162,8 +350,9 @@ class VTKBase(ABC):
     def seriesi(self):
         return self._seriesi
 
+    # fields: names of the arrays to decode, None for all
     @abstractmethod
-    def to_pyvista(self):
+    def to_pyvista(self, fields=None):
         pass
 
     @abstractmethod
@@ -171,15 +360,43 @@ class VTKBase(ABC):
         pass
 
 
+# layout detected from the blocks of a vtm, None if they are not on a rectilinear partition
+def detect_layout(vtm):
+    try:
+        return VTMLayout.from_vtm(vtm)
+    except ValueError:
+        return None
+
+
 class VTM(VTKBase):
-    def __init__(self, path, tstep, seriesi):
+    # dumps: the VTMList keeping the detected layout for all its frames
+    def __init__(self, path, tstep, seriesi, dumps=None):
         VTKBase.__init__(self, path, tstep, seriesi)
+        self._dumps = dumps
+
+    def _layout(self):
+        if self._dumps is not None:
+            return self._dumps.frame_layout(self)
+        layout = find_layout(self._path.parent)
+        return detect_layout(self) if layout is None else layout
+
+    # blocks on a rectilinear partition are placed by the layout index into a full rectilinear grid,
+    # the stored layout or one detected once for the dump, otherwise they are merged into an
+    # unstructured grid by a tolerance search
+    # bounds: [x1, x2, y1, y2, z1, z2], only the sub vtrs intersecting the box are opened
+    # and the cropped rectilinear grid is returned
+    def to_pyvista(self, fields=None, nthreads=1, bounds=None):
+        layout = self._layout()
+        if layout is not None:
+            return read_vtm_as_vtr(self._path, layout, nthreads, fields, bounds)
+        if bounds is not None:
+            raise ValueError(
+                f"Bounds need the blocks of {self._path} on a rectilinear partition"
+            )
+        return read_vtk(self._path, fields).combine().clean(tolerance=1e-6)
 
-    def to_pyvista(self):
-        return pv.read(self._path).combine().clean(tolerance=1e-6)
-
-    def to_pyvista_multiblock(self):
-        return pv.read(self._path)
+    def to_pyvista_multiblock(self, fields=None):
+        return read_vtk(self._path, fields)
 
     def __repr__(self):
         return f"VTM(tstep = {self._tstep})"
@@ -189,8 +406,8 @@ class VTK(VTKBase):
     def __init__(self, path, tstep, seriesi):
         VTKBase.__init__(self, path, tstep, seriesi)
 
-    def to_pyvista(self):
-        return pv.read(self._path)
+    def to_pyvista(self, fields=None):
+        return read_vtk(self._path, fields)
 
     def __repr__(self):
         return f"VTK(tstep = {self._tstep})"
@@ -200,8 +417,14 @@ class VTR(VTKBase):
     def __init__(self, path, tstep, seriesi):
         VTKBase.__init__(self, path, tstep, seriesi)
 
-    def to_pyvista(self):
-        return pv.read(self._path)
+    # bounds: [x1, x2, y1, y2, z1, z2], only the hyperslab of the cells intersecting the box is read
+    def to_pyvista(self, fields=None, bounds=None):
+        return read_vtr(self._path, fields, bounds)
+
+    # zero-copy np.memmap views of the cell fields, indexed [i, j, k, (comp)]
+    # only for uncompressed appended raw files, e.g. written by to_vtrs(streaming=True)
+    def to_memmap(self, fields=None):
+        return memmap_vtr(self._path, fields)
 
     def __repr__(self):
         return f"VTR(tstep = {self._tstep})"
@@ -53,6 +53,10 @@ class ToolsLinker:
             cls.create_slicecontour_video = dump.create_slicecontour_video
             cls.create_recorder_video = dump.create_recorder_video
             cls.create_bodyanim_video = dump.create_bodyanim_video
+            cls.create_moment_fields = dump.create_moment_fields
+            cls.create_phase_fields = dump.create_phase_fields
+            cls.create_modal_fields = dump.create_modal_fields
+            cls.create_spectral_fields = dump.create_spectral_fields
 
             return cls
 
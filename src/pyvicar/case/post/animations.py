@@ -1,13 +1,14 @@
-import ffmpeg
 import shutil
-import matplotlib.pyplot as plt
-from pyvicar._utilities import Optional
+from pyvicar._utilities import Optional, lazy_import
 from pyvicar.tools.ffmpeg import Canvas
 from pyvicar._tree import Group, Dict, List
 from pyvicar.file import Readable
 from pyvicar.file import Series, Siblings
 import pyvicar.tools.mpi as mpi
 
+ffmpeg = lazy_import("ffmpeg")
+plt = lazy_import("matplotlib.pyplot")
+
 
 class AnimationDict(Dict, Readable, Optional):
     def __init__(self, post):
@@ -181,14 +182,15 @@ class Animation(Group, Dict, Readable):
                 threads = 1
 
         if run:
-            (
-                video.output(
-                    f"{self._path}/{self._name}.{outformat}",
-                    pix_fmt="yuv420p",  # cross-platform compatibility
+            with mpi.span("encode"):
+                (
+                    video.output(
+                        f"{self._path}/{self._name}.{outformat}",
+                        pix_fmt="yuv420p",  # cross-platform compatibility
+                    )
+                    .overwrite_output()
+                    .run(quiet=quiet)
                 )
-                .overwrite_output()
-                .run(quiet=quiet)
-            )
         # use this to specify maximum threads, but may encounter memory issue
         # video.output(f"{self._path}/{self._name}.{outformat}", threads=threads)
 
@@ -250,11 +252,13 @@ class Frames(List, Readable, Optional):
 
     def frame_by_pyvista(self, seriesi, plotter, *args, **kwargs):
         path = self._path / f"{self._name}.{seriesi}.png"
-        plotter.show(screenshot=path, *args, **kwargs)
+        with mpi.span("render"):
+            plotter.show(screenshot=path, *args, **kwargs)
 
     def frame_by_matplotlib(self, seriesi, fig, *args, **kwargs):
         path = self._path / f"{self._name}.{seriesi}.png"
-        fig.savefig(path, *args, **kwargs)
+        with mpi.span("render"):
+            fig.savefig(path, *args, **kwargs)
         plt.close(fig)
 
     def to_ffmpeg(
@@ -287,15 +291,16 @@ class Frames(List, Readable, Optional):
                 threads = 1
 
         if run:
-            (
-                self.to_ffmpeg(framerate)
-                .output(
-                    f"{self._animation.path}/{self._name}.{outformat}",
-                    pix_fmt="yuv420p",  # cross-platform compatibility
+            with mpi.span("encode"):
+                (
+                    self.to_ffmpeg(framerate)
+                    .output(
+                        f"{self._animation.path}/{self._name}.{outformat}",
+                        pix_fmt="yuv420p",  # cross-platform compatibility
+                    )
+                    .overwrite_output()
+                    .run(quiet=quiet)
                 )
-                .overwrite_output()
-                .run(quiet=quiet)
-            )
         mpi.barrier_or_async()
 
 
@@ -1,15 +1,16 @@
-import pandas as pd
 import json
 import numpy as np
 import shutil
-import matplotlib.pyplot as plt
 from collections.abc import Sequence
-from pyvicar._utilities import Optional
+from pyvicar._utilities import Optional, lazy_import
 from pyvicar._tree import Group, Dict, List
 from pyvicar.file import Readable
 from pyvicar.file import Series, Siblings
 import pyvicar.tools.mpi as mpi
 
+pd = lazy_import("pandas")
+plt = lazy_import("matplotlib.pyplot")
+
 
 class ReportDict(Dict, Readable, Optional):
     def __init__(self, post):
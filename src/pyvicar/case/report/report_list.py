@@ -1,11 +1,13 @@
 import numpy as np
-import pandas as pd
+from pyvicar._utilities import lazy_import
 from pathlib import Path
 from pyvicar._utilities import Optional
 from pyvicar._tree import Group, Field, List
 from pyvicar.file import Readable
 from pyvicar.file import Series
 
+pd = lazy_import("pandas")
+
 
 class ReportList(List, Readable, Optional):
     def __init__(self, case, prefix):
@@ -1,5 +1,5 @@
 import numpy as np
-import pandas as pd
+from pyvicar._utilities import lazy_import
 from pyvicar.geometry.presets import (
     create_sphere,
     create_cyl_2d,
@@ -9,6 +9,8 @@ from pyvicar.geometry.presets import (
 from pyvicar.geometry.spanned_2dcurve import Spanned2DCurve
 from pyvicar.geometry.trisurface import TriSurface
 
+pd = lazy_import("pandas")
+
 
 # pass mesh=None if no surf data is needed (no example for solid, but possible for the memb below)
 def append_solid(case, mesh=None):
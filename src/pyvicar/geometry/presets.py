@@ -1,10 +1,12 @@
-import trimesh
+from pyvicar._utilities import lazy_import
 import numpy as np
-import pandas as pd
 from pathlib import Path
 from .trisurface import TriSurface
 from .spanned_2dcurve import Spanned2DCurve
 
+trimesh = lazy_import("trimesh")
+pd = lazy_import("pandas")
+
 
 def create_sphere(r, dx, xyz=None, file=None):
     n = 0.5 * np.log2((2 * np.pi * r) ** 2 / (20 * dx**2))
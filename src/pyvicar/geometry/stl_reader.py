@@ -1,5 +1,7 @@
 import numpy as np
-import stl
+from pyvicar._utilities import lazy_import
+
+stl = lazy_import("stl")
 
 
 # map: originallist -> newlist
@@ -1,9 +1,11 @@
+from pyvicar._utilities import lazy_import
 import numpy as np
-import pyvista as pv
-import trimesh
 from pyvicar._datatype import Dataset2D
 from .stl_reader import read_stl
 
+pv = lazy_import("pyvista")
+trimesh = lazy_import("trimesh")
+
 
 class TriSurface:
     def __init__(self, xyz: Dataset2D, conn: Dataset2D):
@@ -1,10 +1,12 @@
 import numpy as np
-import matplotlib.pyplot as plt
+from pyvicar._utilities import lazy_import
 from collections import Counter
 from dataclasses import dataclass
 import pyvicar.tools.log as log
 from pyvicar._format import Table
 
+plt = lazy_import("matplotlib.pyplot")
+
 
 def get_grid(c, dir):
     unif = getattr(c.input.domain, f"{dir}gridUnif")
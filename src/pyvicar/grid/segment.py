@@ -1,7 +1,9 @@
 import numpy as np
 import heapq
 from dataclasses import dataclass
-from scipy.interpolate import interp1d
+from pyvicar._utilities import lazy_import
+
+interpolate = lazy_import("scipy.interpolate")
 
 
 def newton_iter(f, x0, maxiter=50, tol=1e-6):
@@ -188,7 +190,7 @@ class Segment:
         i_old = np.linspace(0, 1, self.npoint)
         i_new = np.linspace(0, 1, n)
 
-        interpolator = interp1d(i_old, self.grid, kind="cubic")
+        interpolator = interpolate.interp1d(i_old, self.grid, kind="cubic")
         self.grid = interpolator(i_new)
 
         return self
@@ -1,6 +1,8 @@
-import ffmpeg
+from pyvicar._utilities import lazy_import
 from pathlib import Path
 
+ffmpeg = lazy_import("ffmpeg")
+
 
 def probe_video(path):
     probe = ffmpeg.probe(path)
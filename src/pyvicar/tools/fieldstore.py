@@ -0,0 +1,198 @@
+from pyvicar._utilities import lazy_import
+import numpy as np
+from pathlib import Path
+import pyvicar.tools.mpi as mpi
+from pyvicar.tools.log import log
+
+h5py = lazy_import("h5py")
+
+
+# chunk edge along t, x, y, z when not specified
+_default_chunks = (16, 32, 32, 32)
+
+
+# shape: frame shape [x, y, z(, comp)]
+def _chunks_for(shape, chunks):
+    if chunks is None:
+        chunks = _default_chunks
+    spatial = tuple(min(c, n) for c, n in zip(chunks[1:], shape[:3]))
+    # components are always kept in the same chunk
+    return (chunks[0],) + spatial + tuple(shape[3:])
+
+
+# per-field time series of a structured dump in one chunked hdf5 file
+# fields/NAME: [t, x, y, z(, comp)] cell data, x, y, z: node coordinates, tstep: [t]
+class FieldStore:
+    def __init__(self, path, mode="r"):
+        self._path = Path(path)
+        self._f = h5py.File(self._path, mode)
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def fields(self):
+        return list(self._f["fields"].keys())
+
+    @property
+    def tstep(self):
+        return self._f["tstep"][...]
+
+    @property
+    def x(self):
+        return self._f["x"][...]
+
+    @property
+    def y(self):
+        return self._f["y"][...]
+
+    @property
+    def z(self):
+        return self._f["z"][...]
+
+    @property
+    def nt(self):
+        return self._f["tstep"].shape[0]
+
+    @property
+    def shape(self):
+        return (self.nt,) + tuple(self._f[c].shape[0] - 1 for c in "xyz")
+
+    # h5py dataset, slicing reads only the chunks the hyperslab touches
+    def __getitem__(self, name):
+        return self._f["fields"][name]
+
+    # t, i, j, k: int, slice or index array of time frame and cell index
+    def slab(self, name, t=slice(None), i=slice(None), j=slice(None), k=slice(None)):
+        return self[name][t, i, j, k, ...]
+
+    # derived fields written by write_field_group, e.g. store.group("moments")["VEL_mean"]
+    def group(self, name):
+        return self._f[name]
+
+    # cell index containing the given coordinate along x, y or z
+    def locate(self, axis, value):
+        coords = self._f[axis][...]
+        return int(np.clip(np.searchsorted(coords, value) - 1, 0, coords.shape[0] - 2))
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return f"FieldStore({self._path}; shape: {self.shape}; fields: {self.fields})"
+
+
+def _cell_arrays(mesh, fields):
+    if not hasattr(mesh, "x"):
+        raise TypeError(
+            f"Field store needs a rectilinear grid, but encountered {type(mesh).__name__}, store a vtm with a layout or a vtr"
+        )
+    if fields is None:
+        fields = list(mesh.cell_data.keys())
+
+    nxc, nyc, nzc = (n - 1 for n in mesh.dimensions)
+    arrays = {}
+    for name in fields:
+        values = mesh.cell_data[name]
+        arrays[name] = values.reshape((nxc, nyc, nzc) + values.shape[1:], order="F")
+    return arrays
+
+
+# the frames after the last stored tstep appended to the store, run by the host
+def _append_frames(vtks, path, fields, chunks, compression):
+    with h5py.File(path, "a") as f:
+        last = f["tstep"][-1] if "tstep" in f and f["tstep"].shape[0] else None
+        todo = [vtk for vtk in vtks if last is None or vtk.tstep > last]
+        if last is not None:
+            log(
+                f"Field Store: {path} has frames up to tstep {last}, appending {len(todo)} frames"
+            )
+
+        if "fields" in f:
+            stored = list(f["fields"].keys())
+            if fields is not None and sorted(fields) != sorted(stored):
+                raise ValueError(
+                    f"Field Store: {path} stores {stored}, cannot append frames of {list(fields)}"
+                )
+            fields = stored
+
+        for vtk in todo:
+            log(f"Field Store: Storing {vtk}")
+            mesh = vtk.to_pyvista(fields=fields)
+            arrays = _cell_arrays(mesh, fields)
+
+            if "tstep" not in f:
+                f.create_dataset("x", data=mesh.x)
+                f.create_dataset("y", data=mesh.y)
+                f.create_dataset("z", data=mesh.z)
+                f.create_dataset("tstep", shape=(0,), maxshape=(None,), dtype=int)
+                group = f.create_group("fields")
+                for name, values in arrays.items():
+                    shape = (0,) + values.shape
+                    group.create_dataset(
+                        name,
+                        shape=shape,
+                        maxshape=(None,) + values.shape,
+                        dtype=values.dtype,
+                        chunks=_chunks_for(values.shape, chunks),
+                        compression=compression,
+                    )
+
+            it = f["tstep"].shape[0]
+            f["tstep"].resize((it + 1,))
+            f["tstep"][it] = vtk.tstep
+            for name, dset in f["fields"].items():
+                dset.resize((it + 1,) + dset.shape[1:])
+                dset[it] = arrays[name]
+
+            del mesh, arrays
+
+
+# vtks: list of VTR or VTM, appended in order, a VTMList gets its layout stored first
+# an existing store is extended by the frames after its last tstep, with the fields it already has
+# fields: names of the arrays to store, all of the first frame if not specified
+# chunks: chunk size along (t, x, y, z), compression: h5py filter e.g. "gzip", "lzf"
+def create_field_store(vtks, path, fields=None, chunks=None, compression=None):
+    path = Path(path)
+
+    if hasattr(vtks, "layout") and len(vtks):
+        # the stored layout makes the vtms read as rectilinear frames
+        vtks.layout()
+
+    error = None
+    if mpi.is_synchost_or_async():
+        try:
+            _append_frames(vtks, path, fields, chunks, compression)
+        except Exception as e:
+            error = e
+    # the host's error is raised on every rank instead of leaving them at the barrier
+    if mpi.is_sync():
+        error = mpi.comm().bcast(error, root=0)
+    if error is not None:
+        raise error
+
+    return FieldStore(path)
+
+
+# arrays: {name: [x, y, z(, comp)]} written into a group next to the time series, replacing old ones
+def write_field_group(path, group, x, y, z, arrays):
+    with h5py.File(path, "a") as f:
+        for axis, coords in zip("xyz", (x, y, z)):
+            if axis not in f:
+                f.create_dataset(axis, data=coords)
+            elif not np.array_equal(f[axis][...], coords):
+                raise ValueError(
+                    f"Grid of the {group} fields does not match the {axis} coordinates of {path}"
+                )
+        if group in f:
+            del f[group]
+        g = f.create_group(group)
+        for name, values in arrays.items():
+            g.create_dataset(name, data=values)
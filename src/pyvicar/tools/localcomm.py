@@ -0,0 +1,167 @@
+import os
+import sys
+import atexit
+import functools
+import numpy as np
+from multiprocessing import get_context
+
+_array_ops = {
+    "sum": np.add,
+    "prod": np.multiply,
+    "max": np.maximum,
+    "min": np.minimum,
+}
+
+
+# the subset of an mpi communicator used by tools.mpi over forked local processes
+# the world starts at the first parallel dispatch: proc 0 forks the others, which carry on from there
+# as under mpirun, so code before it runs once and code after it on every proc
+# messages go thru a pipe between proc 0 and each other proc, all calls are matched in program order
+class LocalComm:
+    def __init__(self, nprocs):
+        if nprocs < 1:
+            raise ValueError(f"Local procs should be >= 1, but encountered {nprocs}")
+        self._size = nprocs
+        self._rank = 0
+        self._started = False
+        self._pipes = {}
+        self._pids = []
+        self._ctx = get_context("fork")
+        # next item of a dynamic dispatch, shared by all procs
+        self.counter = None
+
+    def Get_rank(self):
+        return self._rank
+
+    def Get_size(self):
+        return self._size
+
+    @property
+    def started(self):
+        return self._started
+
+    # returns the rank of the calling proc
+    def start(self):
+        if self._started:
+            return self._rank
+        self._started = True
+        if self._size == 1:
+            return self._rank
+
+        self.counter = self._ctx.Value("q", 0)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        for rank in range(1, self._size):
+            parent_end, child_end = self._ctx.Pipe()
+            pid = os.fork()
+            if pid == 0:
+                parent_end.close()
+                for pipe in self._pipes.values():
+                    pipe.close()
+                self._rank = rank
+                self._pipes = {0: child_end}
+                self._pids = []
+                return rank
+            child_end.close()
+            self._pipes[rank] = parent_end
+            self._pids.append(pid)
+
+        atexit.register(self._join)
+        return self._rank
+
+    # proc 0 closes the pipes first, so procs still waiting on it fail instead of hanging
+    def _join(self):
+        for pipe in self._pipes.values():
+            pipe.close()
+        for rank, pid in enumerate(self._pids, start=1):
+            _, status = os.waitpid(pid, 0)
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0:
+                print(
+                    f"Local Backend: Proc {rank} exited with code {code}",
+                    file=sys.stderr,
+                )
+
+    # before the start only proc 0 exists and the collectives are its own
+    def _procs(self):
+        return range(1, self._size) if self._started else range(0)
+
+    def _send(self, dest, obj):
+        self._pipes[dest].send(obj)
+
+    def _recv(self, source):
+        try:
+            return self._pipes[source].recv()
+        except (EOFError, ConnectionResetError):
+            raise RuntimeError(
+                f"Local Backend: Proc {source} exited while proc {self._rank} waits for it"
+            )
+
+    # point to point, between proc 0 and another proc only
+    def send(self, obj, dest, tag=0):
+        if 0 not in (self._rank, dest):
+            raise ValueError(
+                f"Local Backend: Only sends to or from proc 0, but encountered {self._rank} -> {dest}"
+            )
+        self._send(dest, obj)
+
+    def recv(self, source=0, tag=0):
+        return self._recv(source)
+
+    def gather(self, obj, root=0):
+        if self._rank == 0:
+            parts = [obj] + [self._recv(rank) for rank in self._procs()]
+            if root == 0:
+                return parts
+            self._send(root, parts)
+            return None
+        self._send(0, obj)
+        if self._rank == root:
+            return self._recv(0)
+        return None
+
+    def bcast(self, obj, root=0):
+        if root != 0:
+            if self._rank == root:
+                self._send(0, obj)
+            elif self._rank == 0:
+                obj = self._recv(root)
+        if self._rank == 0:
+            for rank in self._procs():
+                self._send(rank, obj)
+            return obj
+        return self._recv(0)
+
+    def allgather(self, obj):
+        return self.bcast(self.gather(obj))
+
+    def allreduce(self, obj, op="sum"):
+        parts = self.allgather(obj)
+        if op == "sum":
+            return sum(parts[1:], parts[0])
+        return functools.reduce(_array_ops[op], parts)
+
+    def Barrier(self):
+        self.allgather(None)
+
+    # buf is reduced in place, on every proc if root is None
+    def reduce_array(self, buf, op="sum", root=None):
+        parts = self.gather(buf, 0)
+        reduced = None
+        if self._rank == 0:
+            reduced = functools.reduce(_array_ops[op], parts)
+        # root None or another proc than 0
+        if root != 0:
+            reduced = self.bcast(reduced)
+        if reduced is not None and (root is None or self._rank == root):
+            buf[...] = reduced
+
+    # sendbufs of all procs concatenated along axis 0, on every proc if root is None
+    def gatherv_array(self, sendbuf, root=None):
+        parts = self.gather(sendbuf, 0)
+        gathered = np.concatenate(parts, axis=0) if self._rank == 0 else None
+        if root != 0:
+            gathered = self.bcast(gathered)
+        if root is None or self._rank == root:
+            return gathered
+        return None
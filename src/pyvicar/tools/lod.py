@@ -0,0 +1,91 @@
+from pyvicar._utilities import lazy_import
+import numpy as np
+
+pv = lazy_import("pyvista")
+
+
+# nodes of the coarse grid, every level-th node and the last one
+def lod_coords(coords, level):
+    coords = np.asarray(coords)
+    return np.append(coords[:-1:level], coords[-1])
+
+
+def _along(values, axis, ndim):
+    shape = [1] * ndim
+    shape[axis] = -1
+    return values.reshape(shape)
+
+
+# volume weighted cell averages of a rectilinear grid at coarser levels, level^3 cells per coarse cell,
+# accumulated block by block so that the pyramid is built in the same pass as the stitching
+class LODPyramid:
+    # levels: e.g. (2, 4, 8)
+    def __init__(self, x, y, z, levels):
+        self._fine = (np.asarray(x), np.asarray(y), np.asarray(z))
+        self._levels = list(levels)
+        for level in self._levels:
+            if int(level) != level or level < 2:
+                raise ValueError(
+                    f"LOD level should be an integer >= 2, but encountered {level}"
+                )
+        self._coords = {
+            level: tuple(lod_coords(c, level) for c in self._fine)
+            for level in self._levels
+        }
+        self._sums = {level: {} for level in self._levels}
+        self._dtypes = {}
+
+    @property
+    def levels(self):
+        return self._levels
+
+    # values: cell field [i, j, k, (comp)] of a block, crop: its cell index slices (i, j, k) in the full grid
+    def add(self, name, values, crop):
+        if name not in self._dtypes:
+            self._dtypes[name] = (
+                values.dtype if np.issubdtype(values.dtype, np.floating) else np.float64
+            )
+
+        for level in self._levels:
+            coarse = values.astype(np.float64)
+            cslices = []
+            for axis, (coords, s) in enumerate(zip(self._fine, crop)):
+                # weighted by the cell width, the volume is separable on a rectilinear grid
+                width = np.diff(coords[s.start : s.stop + 1])
+                coarse = coarse * _along(width, axis, coarse.ndim)
+
+                icoarse = np.arange(s.start, s.stop) // level
+                starts = np.concatenate(([0], np.flatnonzero(np.diff(icoarse)) + 1))
+                coarse = np.add.reduceat(coarse, starts, axis=axis)
+                cslices.append(slice(icoarse[0], icoarse[-1] + 1))
+
+            sums = self._sums[level]
+            if name not in sums:
+                shape = tuple(c.shape[0] - 1 for c in self._coords[level])
+                sums[name] = np.zeros(shape + values.shape[3:], dtype=np.float64)
+            sums[name][tuple(cslices) + (...,)] += coarse
+
+    def to_pyvista(self, level):
+        x, y, z = self._coords[level]
+        mesh = pv.RectilinearGrid(x, y, z)
+        volume = (
+            _along(np.diff(x), 0, 3)
+            * _along(np.diff(y), 1, 3)
+            * _along(np.diff(z), 2, 3)
+        )
+
+        for name, sums in self._sums[level].items():
+            average = sums / volume.reshape(volume.shape + (1,) * (sums.ndim - 3))
+            mesh.cell_data[name] = average.reshape(
+                (mesh.n_cells,) + sums.shape[3:], order="F"
+            ).astype(self._dtypes[name])
+
+        return mesh
+
+    # adds every cell field of a full rectilinear grid
+    def add_mesh(self, mesh):
+        crop = tuple(slice(0, n - 1) for n in mesh.dimensions)
+        shape = tuple(s.stop for s in crop)
+        for name in mesh.cell_data:
+            values = mesh.cell_data[name]
+            self.add(name, values.reshape(shape + values.shape[1:], order="F"), crop)
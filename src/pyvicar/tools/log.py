@@ -33,10 +33,18 @@ class StdLogger(Logger):
 class FileLogger(Logger):
     def __init__(self, basename="log", mode="w"):
         self._basename = basename
-        self._f = lazy_open(f"{basename}.{mpi.rank()}", mode)
+        self._mode = mode
+        self._files = {}
+
+    # one file per rank, local procs only get their rank at the first dispatch
+    def _f(self):
+        rank = mpi.rank()
+        if rank not in self._files:
+            self._files[rank] = lazy_open(f"{self._basename}.{rank}", self._mode)
+        return self._files[rank]
 
     def log(self, *args):
-        print(*add_header(args), file=self._f, flush=True)
+        print(*add_header(args), file=self._f(), flush=True)
 
     def log_host(self, *args):
         if mpi.is_host():
@@ -0,0 +1,121 @@
+import json
+from pathlib import Path
+import pyvicar.tools.mpi as mpi
+
+
+class Status:
+    Running = "running"
+    Done = "done"
+
+
+# record of converted files, so that repeated conversions skip the finished ones
+# and a crashed job can be picked up cleanly
+# each rank appends to its own journal while converting,
+# the host merges all journals into the main json file at load and close,
+# which are collective like the conversions, also in async mode
+class Manifest:
+    # kind: conversion name, options: json-able dict, a change of which invalidates old records
+    def __init__(self, path, kind, options=None):
+        self._path = Path(path)
+        self._kind = kind
+        self._options = json.loads(json.dumps({} if options is None else options))
+        self._entries = {}
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def kind(self):
+        return self._kind
+
+    def _journal_path(self, rank):
+        return self._path.with_name(f"{self._path.stem}.{rank}.jsonl")
+
+    def _journals(self):
+        return sorted(self._path.parent.glob(f"{self._path.stem}.*.jsonl"))
+
+    def _read(self):
+        if not self._path.exists():
+            return {}
+        with open(self._path, "r") as f:
+            return json.load(f)
+
+    def merge(self):
+        data = self._read()
+        journals = self._journals()
+        for journal in journals:
+            with open(journal, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # last line cut by a crash
+                        continue
+                    kind = record.pop("kind")
+                    data.setdefault(kind, {})[record["source"]] = record
+
+        if not journals:
+            return
+
+        tmppath = self._path.with_name(self._path.stem + ".tmp" + self._path.suffix)
+        with open(tmppath, "w") as f:
+            json.dump(data, f, indent=2)
+        tmppath.replace(self._path)
+
+        for journal in journals:
+            journal.unlink()
+
+    # on_crashed(source): called on host for every source left running by a crashed job, e.g. to remove temporaries
+    def load(self, on_crashed=None):
+        mpi.barrier()
+        if mpi.is_host():
+            self.merge()
+            if on_crashed is not None:
+                for source, entry in self._read().get(self._kind, {}).items():
+                    if entry["status"] == Status.Running and Path(source).exists():
+                        on_crashed(Path(source))
+        mpi.barrier()
+
+        self._entries = self._read().get(self._kind, {})
+        return self
+
+    def close(self):
+        mpi.barrier()
+        if mpi.is_host():
+            self.merge()
+        mpi.barrier()
+
+    # done with the same options, the source is unchanged and the output still exists
+    def is_done(self, source, output):
+        entry = self._entries.get(str(source))
+        if entry is None or entry["status"] != Status.Done:
+            return False
+
+        stat = Path(source).stat()
+        return (
+            entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+            and entry["options"] == self._options
+            and Path(entry["output"]).exists()
+        )
+
+    def record(self, source, output, status):
+        stat = Path(source).stat()
+        record = {
+            "kind": self._kind,
+            "source": str(source),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "output": str(output),
+            "status": status,
+            "options": self._options,
+        }
+        with open(self._journal_path(mpi.rank()), "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def start(self, source, output):
+        self.record(source, output, Status.Running)
+
+    def done(self, source, output):
+        self.record(source, output, Status.Done)
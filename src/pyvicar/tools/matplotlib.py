@@ -1,7 +1,9 @@
-import matplotlib as mpl
-import matplotlib.pyplot as plt
+from pyvicar._utilities import lazy_import
 from pyvicar.tools.miscellaneous import args
 
+mpl = lazy_import("matplotlib")
+plt = lazy_import("matplotlib.pyplot")
+
 
 def font_sizes_l():
     return {
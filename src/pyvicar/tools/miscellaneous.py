@@ -1,4 +1,6 @@
 from dataclasses import fields
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 
 def split_into_n(total, n):
@@ -14,6 +16,23 @@ def split_into_n(total, n):
     return nelems
 
 
+# ordered map over a thread pool, at most nthreads items are in flight
+# so that prefetched results do not pile up ahead of the consumer
+def threaded_imap(f, items, nthreads=1):
+    if nthreads <= 1:
+        yield from map(f, items)
+        return
+
+    with ThreadPoolExecutor(nthreads) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(f, item))
+            if len(pending) >= nthreads:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
 class args:
     # recursive: if an item is a subdict, add default values to it from its counterpart in default dict
     @staticmethod
@@ -1,13 +1,91 @@
-from mpi4py import MPI
-from collections.abc import Iterable, Sequence
+import numpy as np
+from collections.abc import Iterable, Sequence, Mapping
 from itertools import product
 from enum import Enum
+import os
+import sys
+import json
 import time
+import heapq
+import importlib.util
+import threading
+from pathlib import Path
 from datetime import timedelta
+from contextlib import contextmanager
 from pyvicar.tools.miscellaneous import split_into_n
+from pyvicar.tools.localcomm import LocalComm
+
+# set by the launchers of mpi implementations: open mpi, hydra/pmi, pmix, mvapich
+_launcher_envs = [
+    "OMPI_COMM_WORLD_SIZE",
+    "PMI_SIZE",
+    "PMI_RANK",
+    "PMIX_RANK",
+    "MV2_COMM_WORLD_SIZE",
+]
+
+# tasks of a job reported by the schedulers: slurm, pbs, lsf, sge
+_scheduler_envs = ["SLURM_NTASKS", "PBS_NP", "LSB_DJOB_NUMPROC", "NSLOTS"]
+
+
+# the first scheduler variable set and its number of tasks, (None, 1) outside a job
+def _scheduler_ntasks():
+    for env in _scheduler_envs:
+        try:
+            return env, int(os.environ[env])
+        except (KeyError, ValueError):
+            continue
+    return None, 1
+
+
+# local procs when not under an mpi launcher: PYVICAR_NPROCS, else all cores of a script
+# if the local backend is asked for, interactive sessions stay serial
+def _local_nprocs(all_cores):
+    if "PYVICAR_NPROCS" in os.environ:
+        return int(os.environ["PYVICAR_NPROCS"])
+    if not all_cores or not hasattr(os, "fork"):
+        return 1
+    if hasattr(sys, "ps1") or sys.flags.interactive or "ipykernel" in sys.modules:
+        return 1
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# PYVICAR_BACKEND: "mpi" for the mpi world, "local" for forked local procs, see LocalComm,
+# the default takes mpi when launched by mpirun/srun, or in a job of several tasks if mpi4py
+# is installed, as other launchers may not set the variables above, otherwise a plain script
+# runs serially unless PYVICAR_NPROCS is set, as the script after the first dispatch runs on every proc
+_backend = os.environ.get("PYVICAR_BACKEND", "auto")
+_local_asked = _backend == "local"
+_ntasks_env, _ntasks = _scheduler_ntasks()
+if _backend == "auto":
+    if any(env in os.environ for env in _launcher_envs):
+        _backend = "mpi"
+    elif _ntasks > 1 and importlib.util.find_spec("mpi4py") is not None:
+        _backend = "mpi"
+    else:
+        _backend = "local"
+if _backend not in ("mpi", "local"):
+    raise ValueError(
+        f"Expected PYVICAR_BACKEND = mpi, local or auto, but encountered {_backend}"
+    )
+
+# log imports this module, so the warning goes to stderr directly
+if _backend == "local" and _ntasks > 1:
+    reason = "PYVICAR_BACKEND = local" if _local_asked else "mpi4py is not installed"
+    print(
+        f"Warning: {_ntasks_env} = {_ntasks} tasks, but running the local backend as {reason}, "
+        f"each task launched runs the whole script on its own",
+        file=sys.stderr,
+    )
 
+if _backend == "mpi":
+    from mpi4py import MPI
 
-_comm = MPI.COMM_WORLD
+    _comm = MPI.COMM_WORLD
+else:
+    _comm = LocalComm(_local_nprocs(_local_asked))
 _rank = _comm.Get_rank()
 _size = _comm.Get_size()
 
@@ -16,6 +94,35 @@ _is_host = _rank == 0
 _start_time = time.time()
 
 
+def backend():
+    return _backend
+
+
+# the local procs are forked at the first dispatch, until then only proc 0 exists
+def _start_world():
+    global _rank, _is_host, _reported
+    if _backend == "local" and not _comm.started:
+        _rank = _comm.start()
+        _is_host = _rank == 0
+        # the spans before the fork are proc 0's
+        if not _is_host:
+            _spans.clear()
+            _reported = 0
+
+
+# nprocs of the local backend, before the first dispatch
+def set_local_nprocs(nprocs):
+    global _comm, _size
+    if _backend != "local":
+        raise RuntimeError(
+            f"Local procs are only set for the local backend, but running {_backend}"
+        )
+    if _comm.started:
+        raise RuntimeError(f"Local procs are already started by a dispatch")
+    _comm = LocalComm(nprocs)
+    _size = nprocs
+
+
 def barrier():
     return _comm.Barrier()
 
@@ -48,6 +155,10 @@ def set_sync():
     global _parallelmode
     _parallelmode = ParallelMode.Sync
     _comm.Barrier()
+    if _profile:
+        report_spans(
+            f"Profile: Section up to {timedelta(seconds=round(_span_clock()))}"
+        )
 
 
 def set_async():
@@ -81,19 +192,79 @@ def barrier_or_async():
         _comm.Barrier()
 
 
-def dispatch_sequence(listobj: Sequence, startidx=0):
+class Schedule(Enum):
+    Static = 0
+    Dynamic = 1
+
+
+# static: contiguous equal counts, dynamic: chunks of items handed out by the host on request
+_schedule = Schedule[os.environ.get("PYVICAR_MPI_SCHEDULE", "static").capitalize()]
+_chunk = int(os.environ.get("PYVICAR_MPI_CHUNK", "1"))
+
+
+def schedule():
+    return _schedule
+
+
+def set_schedule(schedule, chunk=1):
+    global _schedule, _chunk
+    if isinstance(schedule, str):
+        schedule = Schedule[schedule.capitalize()]
+    if chunk < 1:
+        raise ValueError(f"Dispatch chunk should be >= 1, but encountered {chunk}")
+    _schedule = schedule
+    _chunk = chunk
+
+
+# requests of dynamic dispatches go thru a duplicated communicator,
+# each dispatch takes its own pair of tags as all ranks call dispatch in the same order
+_sched_comm = None
+_sched_count = 0
+
+
+def _next_sched_tags():
+    global _sched_comm, _sched_count
+    if _sched_comm is None:
+        _sched_comm = _comm.Dup()
+    _sched_count += 1
+    tag = 2 * (_sched_count % 16384)
+    return tag, tag + 1
+
+
+def dispatch_sequence(
+    listobj: Sequence,
+    startidx=0,
+    schedule=None,
+    chunk=None,
+    cost=None,
+    method="contiguous",
+):
+    _start_world()
+    if schedule is None:
+        schedule = _schedule
+    elif isinstance(schedule, str):
+        schedule = Schedule[schedule.capitalize()]
+    if schedule == Schedule.Dynamic and _size > 1:
+        chunk = _chunk if chunk is None else chunk
+        if _backend == "local":
+            return LocalDynamicView(listobj, startidx, chunk)
+        return MPIDynamicView(listobj, startidx, chunk)
+
     # calculate the elements and dispatch views to each processor
     if _rank == 0:
-        nelems = split_into_n(len(listobj), _size)
-        # reverse is used to relieve proc 0
-        nelems.reverse()
-
-        views = []
-        ptr = startidx
-        for nelem in nelems:
-            view = MPIView(ptr, ptr + nelem, startidx)
-            views.append(view)
-            ptr += nelem
+        if cost is None or _size == 1:
+            nelems = split_into_n(len(listobj), _size)
+            # reverse is used to relieve proc 0
+            nelems.reverse()
+
+            views = []
+            ptr = startidx
+            for nelem in nelems:
+                view = MPIView(ptr, ptr + nelem, startidx)
+                views.append(view)
+                ptr += nelem
+        else:
+            views = _cost_views(item_costs(listobj, cost), startidx, method)
 
         # dispatch views
         for i in range(_size):
@@ -110,9 +281,12 @@ def dispatch_sequence(listobj: Sequence, startidx=0):
 
 
 # dispatch an Iterable, first create indexed list as its parent
-def dispatch(listobj: Iterable):
+# cost: per-item weights to balance the static split, see item_costs, method: "contiguous" or "lpt"
+def dispatch(
+    listobj: Iterable, schedule=None, chunk=None, cost=None, method="contiguous"
+):
     # refer to a list, so startidx must = 0
-    return dispatch_sequence(list(listobj), 0)
+    return dispatch_sequence(list(listobj), 0, schedule, chunk, cost, method)
 
 
 def prod_and_dispatch(*args):
@@ -158,6 +332,566 @@ class MPIView(Iterable):
         return f"MPIView({self._parent.__class__.__name__}[{self._start} : {self._stop}] @ Proc {_rank})"
 
 
+# the host hands out the next chunk to whichever rank asks, so slow items do not hold up a fixed share
+# with MPI_THREAD_MULTIPLE the host serves from a thread and works as well, otherwise it only serves
+# the view is iterated once and to the end by every rank, as the host waits for all ranks to finish
+class MPIDynamicView(Iterable):
+    def __init__(self, parent, startidx=0, chunk=1):
+        self._parent = parent
+        self._startidx = startidx
+        self._chunk = chunk
+        self._nitem = len(parent)
+        self._tags = _next_sched_tags()
+        self._threaded = MPI.Query_thread() >= MPI.THREAD_MULTIPLE
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @property
+    def startidx(self):
+        return self._startidx
+
+    @property
+    def chunk(self):
+        return self._chunk
+
+    def _serve(self, nworker):
+        reqtag, reptag = self._tags
+        status = MPI.Status()
+        next_start = 0
+        while nworker > 0:
+            _sched_comm.recv(source=MPI.ANY_SOURCE, tag=reqtag, status=status)
+            _sched_comm.send(next_start, dest=status.Get_source(), tag=reptag)
+            if next_start >= self._nitem:
+                nworker -= 1
+            else:
+                next_start += self._chunk
+
+    def _work(self):
+        reqtag, reptag = self._tags
+        while True:
+            _sched_comm.send(_rank, dest=0, tag=reqtag)
+            start = _sched_comm.recv(source=0, tag=reptag)
+            if start >= self._nitem:
+                return
+            stop = min(start + self._chunk, self._nitem)
+            yield from self._parent[self._startidx + start : self._startidx + stop]
+
+    def __iter__(self):
+        if _rank != 0:
+            yield from self._work()
+        elif self._threaded:
+            server = threading.Thread(target=self._serve, args=(_size,), daemon=True)
+            server.start()
+            yield from self._work()
+            server.join()
+        else:
+            self._serve(_size - 1)
+
+    def __repr__(self):
+        return f"MPIDynamicView({self._parent.__class__.__name__}[{self._nitem} by {self._chunk}] @ Proc {_rank})"
+
+
+# file size of a frame or any item with a path, a vtm includes the block folder next to it
+def file_size(item):
+    path = Path(getattr(item, "path", item))
+    paths = [path]
+    if path.suffix == ".vtm":
+        paths.append(path.with_suffix(""))
+
+    size = 0
+    for path in paths:
+        if path.is_dir():
+            size += sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+        elif path.exists():
+            size += path.stat().st_size
+    return size
+
+
+# cost: a sequence of weights, a callable of the item, e.g. a CostRecord, or "size" for the file size on disk
+# evaluated on the host only
+def item_costs(listobj, cost):
+    if isinstance(cost, str):
+        if cost != "size":
+            raise ValueError(
+                f"Expected cost = size, a callable or weights, but encountered {cost}"
+            )
+        for item in listobj:
+            if not isinstance(getattr(item, "path", item), (str, os.PathLike)):
+                raise ValueError(
+                    f"Expected paths or items with a path for cost = size, but encountered {type(item).__name__}, use a callable or weights instead"
+                )
+        return [float(file_size(item)) for item in listobj]
+    if callable(cost):
+        return [float(cost(item)) for item in listobj]
+
+    costs = [float(c) for c in cost]
+    if len(costs) != len(listobj):
+        raise ValueError(
+            f"Expected {len(listobj)} item costs, but encountered {len(costs)}"
+        )
+    return costs
+
+
+# contiguous (start, stop) of nparts, minimizing the largest part cost
+# by bisection on the part capacity, each capacity is checked by a greedy fill
+# without any cost the items are split equally
+def contiguous_parts(costs, nparts):
+    if sum(costs) <= 0:
+        bounds = np.cumsum([0] + split_into_n(len(costs), nparts)).tolist()
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def fill(capacity):
+        bounds = [0]
+        load = 0.0
+        for i, c in enumerate(costs):
+            if load + c > capacity and i > bounds[-1]:
+                bounds.append(i)
+                load = 0.0
+            load += c
+        return bounds
+
+    lo = max(costs, default=0.0)
+    hi = max(sum(costs), lo)
+    # one part always fits
+    best = [0]
+    for _ in range(64):
+        if hi - lo <= 1e-9 * hi:
+            break
+        mid = (lo + hi) / 2
+        bounds = fill(mid)
+        if len(bounds) <= nparts:
+            hi = mid
+            best = bounds
+        else:
+            lo = mid
+
+    bounds = best + [len(costs)]
+    parts = list(zip(bounds[:-1], bounds[1:]))
+    return parts + [(len(costs), len(costs))] * (nparts - len(parts))
+
+
+# greedy longest processing time first, the costliest remaining item goes to the least loaded part
+def lpt_parts(costs, nparts):
+    # ties go to the part with fewer items, so zero costs are spread as in the equal split,
+    # then to the later parts, so that proc 0 is relieved
+    heap = [(0.0, 0, -i) for i in range(nparts)]
+    parts = [[] for _ in range(nparts)]
+    for i in sorted(range(len(costs)), key=lambda i: -costs[i]):
+        load, nitem, negpart = heapq.heappop(heap)
+        parts[-negpart].append(i)
+        heapq.heappush(heap, (load + costs[i], nitem + 1, negpart))
+    return [sorted(part) for part in parts]
+
+
+def _cost_views(costs, startidx, method):
+    if method == "contiguous":
+        parts = contiguous_parts(costs, _size)
+        # the greedy fill leaves the last part lightest, reverse to relieve proc 0
+        parts.reverse()
+        views = [MPIView(startidx + a, startidx + b, startidx) for a, b in parts]
+        loads = [sum(costs[a:b]) for a, b in parts]
+    elif method == "lpt":
+        parts = lpt_parts(costs, _size)
+        views = [MPIIndexView(part, startidx) for part in parts]
+        loads = [sum(costs[i] for i in part) for part in parts]
+    else:
+        raise ValueError(
+            f"Expected method = contiguous or lpt, but encountered {method}"
+        )
+
+    # log imports this module
+    import pyvicar.tools.log as log
+
+    mean = sum(loads) / len(loads)
+    imbalance = max(loads) / mean - 1 if mean > 0 else 0.0
+    log.log_host(
+        f"Dispatch: {method} split of {len(costs)} items over {_size} procs, "
+        f"cost per proc max {max(loads):.4g} mean {mean:.4g}, imbalance {imbalance:.1%}"
+    )
+    return views
+
+
+# items of the parent at the given 0-based positions, from a non-contiguous split
+class MPIIndexView(Iterable):
+    def __init__(self, indices, startidx=0):
+        self._parent = None
+        self._indices = list(indices)
+        self._startidx = startidx
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @property
+    def indices(self):
+        return self._indices
+
+    @property
+    def nframe(self):
+        return len(self._indices)
+
+    @property
+    def startidx(self):
+        return self._startidx
+
+    def set_parent(self, parent):
+        self._parent = parent
+
+    def __iter__(self):
+        return (self._parent[self._startidx + i] for i in self._indices)
+
+    def __repr__(self):
+        return f"MPIIndexView({self._parent.__class__.__name__}[{len(self._indices)} items] @ Proc {_rank})"
+
+
+def _cost_key(item):
+    path = getattr(item, "path", None)
+    return Path(path).name if path is not None else str(item)
+
+
+# per-item timings of a job kept in a json file, keyed by the item file name or str(item)
+# e.g. for vtk in record.timed(mpi.dispatch(vtks, cost=record)): ...
+# the next run of the same job splits by the recorded timings, unseen items take the mean
+class CostRecord:
+    def __init__(self, path):
+        self._path = Path(path)
+        self._costs = {}
+        if self._path.exists():
+            with open(self._path, "r") as f:
+                self._costs = json.load(f)
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def costs(self):
+        return self._costs
+
+    def __call__(self, item):
+        key = _cost_key(item)
+        if key in self._costs:
+            return self._costs[key]
+        if self._costs:
+            return sum(self._costs.values()) / len(self._costs)
+        return 1.0
+
+    # times the loop body of each item, the timings of all procs are saved by the host
+    # once every proc has iterated to the end
+    def timed(self, view):
+        timings = {}
+        for item in view:
+            start = time.perf_counter()
+            yield item
+            timings[_cost_key(item)] = time.perf_counter() - start
+
+        parts = _comm.gather(timings, root=0)
+        if _is_host:
+            for part in parts:
+                self._costs.update(part)
+            tmppath = self._path.with_name(self._path.stem + ".tmp" + self._path.suffix)
+            with open(tmppath, "w") as f:
+                json.dump(self._costs, f)
+            tmppath.replace(self._path)
+        self._costs = _comm.bcast(self._costs, root=0)
+
+
+# numeric array results of one shape and dtype go thru the Gatherv buffers, anything else is pickled
+def _result_spec(results):
+    if not results:
+        return None
+    spec = None
+    for result in results:
+        if not isinstance(result, (np.ndarray, np.generic, int, float, complex)):
+            return "object"
+        arr = np.asarray(result)
+        if arr.dtype.kind not in "biufc":
+            return "object"
+        if spec is None:
+            spec = (arr.shape, arr.dtype.str)
+        elif spec != (arr.shape, arr.dtype.str):
+            return "object"
+    return spec
+
+
+def _gatherv(sendbuf, counts, root):
+    if _backend == "local":
+        return _comm.gatherv_array(sendbuf, root)
+
+    recvbuf = np.empty((sum(counts),) + sendbuf.shape[1:], dtype=sendbuf.dtype)
+    itemsize = int(np.prod(sendbuf.shape[1:]))
+    recvspec = [recvbuf, [n * itemsize for n in counts]]
+    if root is None:
+        _comm.Allgatherv(sendbuf, recvspec)
+    else:
+        _comm.Gatherv(sendbuf, recvspec if _rank == root else None, root=root)
+    return recvbuf
+
+
+# fn(item) over the items dispatched to all procs, results in item order on root, None on the others
+# root=None returns the results on every proc
+# a [nitem, ...] array if all results are numbers or numeric arrays of one shape and dtype, else a list
+# dispatch_kwargs: schedule, chunk, cost, method as in dispatch
+def map(fn, items, root=0, **dispatch_kwargs):
+    items = list(items)
+    indices = []
+    results = []
+    for i, item in dispatch(enumerate(items), **dispatch_kwargs):
+        indices.append(i)
+        results.append(fn(item))
+
+    specs = _comm.allgather(_result_spec(results))
+    used = set(spec for spec in specs if spec is not None)
+    if len(used) == 1 and used != {"object"}:
+        shape, dtype = used.pop()
+        local = np.empty((len(results),) + shape, dtype=dtype)
+        for row, result in enumerate(results):
+            local[row] = result
+        counts = _comm.allgather(len(results))
+        gathered = _gatherv(local, counts, root)
+        order = _gatherv(np.asarray(indices, dtype=np.int64), counts, root)
+        if root is not None and _rank != root:
+            return None
+        ordered = np.empty_like(gathered)
+        ordered[order] = gathered
+        return ordered
+
+    parts = list(zip(indices, results))
+    if root is None:
+        parts = _comm.allgather(parts)
+    else:
+        parts = _comm.gather(parts, root=root)
+        if _rank != root:
+            return None
+    ordered = [None] * len(items)
+    for part in parts:
+        for i, result in part:
+            ordered[i] = result
+    return ordered
+
+
+_reduce_ops = ["sum", "prod", "max", "min"]
+
+
+def _reduce_buffer(buf, op, root):
+    if _backend == "local":
+        _comm.reduce_array(buf, op, root)
+        return
+
+    mpiop = {"sum": MPI.SUM, "prod": MPI.PROD, "max": MPI.MAX, "min": MPI.MIN}[op]
+    if root is None:
+        _comm.Allreduce(MPI.IN_PLACE, buf, op=mpiop)
+    elif _rank == root:
+        _comm.Reduce(MPI.IN_PLACE, buf, op=mpiop, root=root)
+    else:
+        _comm.Reduce(buf, None, op=mpiop, root=root)
+
+
+def _reduce_identity(op, dtype):
+    if op in ("max", "min") and np.dtype(dtype).kind in "iu":
+        info = np.iinfo(dtype)
+        return info.min if op == "max" else info.max
+    return {"sum": 0, "prod": 1, "max": -np.inf, "min": np.inf}[op]
+
+
+# elementwise reduction of numpy arrays over procs by the buffer collectives, in place where possible
+# arrays: an array, or {name: array} where procs without an entry, e.g. no items dispatched, take
+# the identity of op, so the reduced dict holds the entries of all procs
+# op: "sum", "prod", "max" or "min", root: Reduce to root only, the others keep their partials, None to Allreduce
+def reduce_arrays(arrays, op="sum", root=None):
+    if op not in _reduce_ops:
+        raise ValueError(f"Expected op in {list(_reduce_ops)}, but encountered {op}")
+
+    if not isinstance(arrays, Mapping):
+        return reduce_arrays({None: arrays}, op, root)[None]
+
+    specs = {}
+    for part in _comm.allgather({k: (v.shape, v.dtype.str) for k, v in arrays.items()}):
+        specs.update(part)
+
+    reduced = {}
+    for name in specs:
+        shape, dtype = specs[name]
+        if name in arrays:
+            buf = np.ascontiguousarray(arrays[name])
+        else:
+            buf = np.full(shape, _reduce_identity(op, dtype), dtype=dtype)
+        _reduce_buffer(buf, op, root)
+        reduced[name] = buf
+    return reduced
+
+
+# the next chunk is taken from a counter shared by the local procs
+class LocalDynamicView(Iterable):
+    def __init__(self, parent, startidx=0, chunk=1):
+        self._parent = parent
+        self._startidx = startidx
+        self._chunk = chunk
+        self._nitem = len(parent)
+        # all procs are done with the previous dispatch before the counter is reset
+        _comm.Barrier()
+        if _rank == 0:
+            _comm.counter.value = 0
+        _comm.Barrier()
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @property
+    def startidx(self):
+        return self._startidx
+
+    @property
+    def chunk(self):
+        return self._chunk
+
+    def __iter__(self):
+        counter = _comm.counter
+        while True:
+            with counter.get_lock():
+                start = counter.value
+                counter.value = start + self._chunk
+            if start >= self._nitem:
+                return
+            stop = min(start + self._chunk, self._nitem)
+            yield from self._parent[self._startidx + start : self._startidx + stop]
+
+    def __repr__(self):
+        return f"LocalDynamicView({self._parent.__class__.__name__}[{self._nitem} by {self._chunk}] @ Proc {_rank})"
+
+
+# named timing spans per rank, gathered into a stage x rank table at set_sync and print_elapsed_time
+# PYVICAR_PROFILE=1 or set_profile() records them, PYVICAR_TRACE=path also writes a chrome trace
+# (chrome://tracing, ui.perfetto.dev) of all spans at print_elapsed_time
+_trace_path = os.environ.get("PYVICAR_TRACE")
+_profile = (
+    os.environ.get("PYVICAR_PROFILE", "") not in ("", "0") or _trace_path is not None
+)
+_span_start = time.perf_counter()
+# (name, start, end, depth) of this rank, seconds since import
+_spans = []
+_span_depth = 0
+_reported = 0
+
+
+def _span_clock():
+    return time.perf_counter() - _span_start
+
+
+def is_profile():
+    return _profile
+
+
+def set_profile(enabled=True, trace=None):
+    global _profile, _trace_path
+    _profile = enabled
+    if trace is not None:
+        _trace_path = str(trace)
+
+
+# context manager or decorator, e.g. with mpi.span("read"): ... or @mpi.span("render")
+# nested spans are kept in the trace, but only the outermost count as busy time
+@contextmanager
+def span(name):
+    global _span_depth
+    if not _profile:
+        yield
+        return
+    depth = _span_depth
+    _span_depth += 1
+    start = _span_clock()
+    try:
+        yield
+    finally:
+        _span_depth = depth
+        _spans.append((name, start, _span_clock(), depth))
+
+
+def _span_table(gathered, title):
+    # in order of the first start, spans are recorded as they end
+    starts = {}
+    for spans in gathered:
+        for name, start, *_ in spans:
+            starts[name] = min(start, starts.get(name, start))
+    stages = sorted(starts, key=starts.get)
+    columns = {name: i for i, name in enumerate(stages)}
+    totals = np.zeros((len(gathered), len(stages) + 1))
+    counts = np.zeros(len(stages) + 1, dtype=int)
+    for irank, spans in enumerate(gathered):
+        for name, start, end, depth in spans:
+            totals[irank, columns[name]] += end - start
+            counts[columns[name]] += 1
+            if depth == 0:
+                totals[irank, -1] += end - start
+                counts[-1] += 1
+
+    widths = [max(10, len(name) + 2) for name in stages + ["busy"]]
+
+    def row(label, values, fmt):
+        return f"{label:>9}" + "".join(f"{fmt(v):>{w}}" for v, w in zip(values, widths))
+
+    seconds = lambda v: f"{v:.3f}"
+    maxs = totals.max(axis=0)
+    means = totals.mean(axis=0)
+    imbalance = np.divide(maxs, means, out=np.ones_like(maxs), where=means > 0)
+    return (
+        [title, row("rank", stages + ["busy"], str)]
+        + [row(str(irank), totals[irank], seconds) for irank in range(len(gathered))]
+        + [
+            row("max", maxs, seconds),
+            row("mean", means, seconds),
+            row("max/mean", imbalance, lambda v: f"{v:.2f}"),
+            row("slowest", totals.argmax(axis=0), str),
+            row("count", counts, str),
+        ]
+    )
+
+
+# collective, the host prints the stage x rank seconds of the spans since the last report, or of all
+def report_spans(title="Profile", since_last=True):
+    global _reported
+    since = _reported if since_last else 0
+    gathered = _comm.gather(_spans[since:], root=0)
+    _reported = len(_spans)
+    if _is_host and any(gathered):
+        print("\n" + "\n".join(_span_table(gathered, title)) + "\n", flush=True)
+
+
+# collective, all spans of all ranks as chrome trace events, one process per rank
+def write_trace(path):
+    gathered = _comm.gather(_spans, root=0)
+    if not _is_host:
+        return
+    events = []
+    for irank, spans in enumerate(gathered):
+        events.append(
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": irank,
+                "tid": 0,
+                "args": {"name": f"Rank {irank}"},
+            }
+        )
+        for name, start, end, depth in spans:
+            events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": start * 1e6,
+                    "dur": (end - start) * 1e6,
+                    "pid": irank,
+                    "tid": 0,
+                }
+            )
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    print(f"Profile: Written {len(events) - len(gathered)} spans to {path}", flush=True)
+
+
 def elapsed_time():
     _comm.Barrier()
     end_time = time.time()
@@ -165,6 +899,10 @@ def elapsed_time():
 
 
 def print_elapsed_time(banner="-"):
+    if _profile:
+        report_spans("Profile: Whole run", since_last=False)
+        if _trace_path is not None:
+            write_trace(_trace_path)
     etime = elapsed_time()
     if _is_host:
         msg = f"Total elapsed time: {str(timedelta(seconds=etime))}"
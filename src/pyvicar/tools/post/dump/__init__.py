@@ -2,6 +2,10 @@ from .isoq import create_isoq_video, Q
 from .recorder import create_recorder_video
 from .slice_contour import create_slicecontour_video
 from .body_anim import create_bodyanim_video
+from .moments import create_moment_fields, FieldMoments
+from .phase import create_phase_fields, PhaseAverages
+from .modal import create_modal_fields, Snapshots
+from .spectral import create_spectral_fields, SpectralMaps
 from .labels import Color, Field, Texture
 from .plotter_fs import set_cam_compass, set_cam_hovering
 from .preprocesses.data import prep_field
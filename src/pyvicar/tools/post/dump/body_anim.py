@@ -1,10 +1,12 @@
-import pyvista as pv
+from pyvicar._utilities import lazy_import
 import pyvicar.tools.log as log
 import pyvicar.tools.mpi as mpi
 from . import labels as lb
 from .preprocesses.data import prep_field
 from .preprocesses.conversions import resolution_to_size
 
+pv = lazy_import("pyvista")
+
 
 # quick generate
 # (c, i, v, m) is fixed plotter function arguments, 
@@ -53,7 +55,8 @@ def create_bodyanim_video(
 
         plotter = pv.Plotter(off_screen=True)
 
-        bodies = marker.to_pyvista_multiblocks()
+        with mpi.span("read"):
+            bodies = marker.to_pyvista_multiblocks()
         bodies = marker_f(c, i, None, bodies)
         for body in bodies:
 
@@ -1,26 +1,37 @@
-import pyvista as pv
+from pyvicar._utilities import lazy_import
 import numpy as np
 from dataclasses import dataclass
+from abc import abstractmethod
 import pyvicar.tools.log as log
 import pyvicar.tools.mpi as mpi
 from . import labels as lb
-from .preprocesses.data import prep_field, get_vtks_markers
+from .preprocesses.data import prep_field, get_vtks_markers, unique_sources
 from .preprocesses.conversions import resolution_to_size
 
+pv = lazy_import("pyvista")
+
 
 class QBase:
-    pass
+    @abstractmethod
+    def sources(self):
+        pass
 
 
 @dataclass
 class QExist(QBase):
     q_name: str
 
+    def sources(self):
+        return [self.q_name]
+
 
 @dataclass
 class QFromVel(QBase):
     vel_name: str
 
+    def sources(self):
+        return [self.vel_name]
+
 
 class Q:
     def use_exist(q_name):
@@ -103,6 +114,13 @@ def create_isoq_video(
 
     c, vtks, markers = get_vtks_markers(c, vtks, markers)
 
+    q = Q.from_vel() if q_name is None else Q.use_exist(q_name)
+    # Q, and the velocity gradient of from_vel, are computed by create_isoq,
+    # the color may use them but they are not read from the file
+    computed = ["Q", "gradient"] if isinstance(q, QFromVel) else ["Q"]
+    computed = [name for name in computed if name not in q.sources()]
+    fields = [name for name in unique_sources(q, iso_color) if name not in computed]
+
     mpi.set_async()
 
     for i, (vtk, marker) in mpi.dispatch(enumerate(zip(vtks, markers))):
@@ -110,11 +128,12 @@ def create_isoq_video(
             f"ISOQ Video: Posting frame {i} {vtk}{f' with {marker}' if marker is not None else ''}"
         )
 
-        mesh = vtk.to_pyvista()
+        with mpi.span("read"):
+            mesh = vtk.to_pyvista(fields=fields)
+            bodies = None if marker is None else marker.to_pyvista_multiblocks()
         plotter = pv.Plotter(off_screen=True)
 
         if marker is not None:
-            bodies = marker.to_pyvista_multiblocks()
             bodies = marker_f(c, i, vtk, bodies)
             for body in bodies:
 
@@ -130,10 +149,8 @@ def create_isoq_video(
                     **marker_kwargs,
                 )
 
-        if q_name is None:
-            contours = create_isoq(mesh, iso_value=iso_value)
-        else:
-            contours = create_isoq(mesh, q=Q.use_exist(q_name), iso_value=iso_value)
+        with mpi.span("compute"):
+            contours = create_isoq(mesh, q=q, iso_value=iso_value)
 
         if contours.n_points == 0 or contours.n_cells == 0:
             log.log(f"ISOQ Video: No q isosurfaces after calculation")
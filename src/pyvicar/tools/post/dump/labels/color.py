@@ -8,6 +8,10 @@ class ColorBase:
     def add_mesh_kwargs(self):
         pass
 
+    @abstractmethod
+    def sources(self):
+        pass
+
 
 @dataclass
 class ColorUniform(ColorBase):
@@ -16,6 +20,9 @@ class ColorUniform(ColorBase):
     def add_mesh_kwargs(self):
         return {"color": self.name}
 
+    def sources(self):
+        return []
+
 
 @dataclass
 class ColorField(ColorBase):
@@ -33,6 +40,9 @@ class ColorField(ColorBase):
             "scalar_bar_args": self.scalar_bar_args,
         }
 
+    def sources(self):
+        return self.field.sources()
+
 
 class Color:
     @staticmethod
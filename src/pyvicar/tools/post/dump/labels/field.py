@@ -6,6 +6,7 @@ from abc import abstractmethod
 # name is the base name for the field, but without possible suffix like vec components
 # fullname is promised full access name for the field that field prep needs to obey
 # and other dependant settings can rely on without touching prep details
+# sources are the dumped arrays field prep reads, so readers can skip the others
 @dataclass
 class FieldBase:
     name: str
@@ -14,16 +15,26 @@ class FieldBase:
     def fullname(self):
         pass
 
+    @abstractmethod
+    def sources(self):
+        pass
+
 
 class FieldScalar(FieldBase):
     def fullname(self):
         return self.name
 
+    def sources(self):
+        return [self.name]
+
 
 @dataclass
 class FieldRenameScalar(FieldScalar):
     orig: str
 
+    def sources(self):
+        return [self.orig]
+
 
 class VecComp(Enum):
     X = 0
@@ -39,11 +50,17 @@ class FieldVector(FieldBase):
     def fullname(self):
         return f"{self.name}({self.component.name})"
 
+    def sources(self):
+        return [self.name]
+
 
 @dataclass
 class FieldVectorVORFromVEL(FieldVector):
     vel_name: str
 
+    def sources(self):
+        return [self.vel_name]
+
 
 class Field:
     @staticmethod
@@ -0,0 +1,261 @@
+import numpy as np
+from pathlib import Path
+import pyvicar.tools.log as log
+import pyvicar.tools.mpi as mpi
+from .preprocesses.data import (
+    get_vtks_series,
+    frame_interval,
+    read_grid_frame,
+)
+from pyvicar.tools.vtkxml import RawVTRWriter, read_raw_vtr_header, write_raw_vtr_kslab
+
+
+# frames as volume weighted snapshot vectors, so the plain dot product is the energy inner product
+class Snapshots:
+    def __init__(self, vtks, fields, bounds=None):
+        self._vtks = list(vtks)
+        self._fields = list(fields)
+        self._bounds = bounds
+
+        # geometry only
+        frame = read_grid_frame(self._vtks[0], [], bounds)
+        self._grid = (frame.x, frame.y, frame.z)
+        widths = [np.diff(coords) for coords in self._grid]
+        self._sqrtw = np.sqrt(np.einsum("i,j,k->ijk", *widths))
+        self._specs = None
+        self.nread = 0
+
+    @property
+    def nt(self):
+        return len(self._vtks)
+
+    @property
+    def grid(self):
+        return self._grid
+
+    def read(self, it):
+        frame = read_grid_frame(self._vtks[it], self._fields, self._bounds)
+        self.nread += 1
+        if self._specs is None:
+            self._specs = [
+                (name, frame.cell_data[name].shape[3:]) for name in self._fields
+            ]
+
+        parts = []
+        for name in self._fields:
+            values = np.asarray(frame.cell_data[name], dtype=np.float64)
+            sqrtw = self._sqrtw.reshape(self._sqrtw.shape + (1,) * (values.ndim - 3))
+            parts.append((values * sqrtw).reshape(-1))
+        return np.concatenate(parts)
+
+    # {name: [i, j, k1 - k0, (comp)]} of the k slab of a frame, unweighted
+    def read_tile(self, it, k0, k1):
+        x, y, z = self._grid
+        bounds = [x[0], x[-1], y[0], y[-1], z[k0], z[k1]]
+        frame = read_grid_frame(self._vtks[it], self._fields, bounds)
+        self.nread += 1
+        return {
+            name: np.asarray(frame.cell_data[name], dtype=np.float64)
+            for name in self._fields
+        }
+
+    # [(name, tensor_shape)] of the fields, from one cell layer of the first frame
+    def specs(self):
+        if self._specs is None:
+            tile = self.read_tile(0, 0, 1)
+            self._specs = [(name, tile[name].shape[3:]) for name in self._fields]
+        return self._specs
+
+
+# method of snapshots gram matrix X^T W X, built from pairs of frame blocks dispatched over the ranks,
+# at most 2 * block frames are held at a time and each frame is read about nt / block times
+def gram_matrix(snapshots, block=16):
+    nt = snapshots.nt
+    blocks = [slice(i, min(i + block, nt)) for i in range(0, nt, block)]
+    pairs = [(a, b) for a in range(len(blocks)) for b in range(a, len(blocks))]
+
+    gram = np.zeros((nt, nt))
+    cached = None
+    for a, b in mpi.dispatch(pairs):
+        if cached is None or cached[0] != a:
+            sa = blocks[a]
+            cached = (
+                a,
+                np.stack([snapshots.read(i) for i in range(sa.start, sa.stop)], axis=1),
+            )
+        xa = cached[1]
+        if b == a:
+            xb = xa
+        else:
+            sb = blocks[b]
+            xb = np.stack([snapshots.read(i) for i in range(sb.start, sb.stop)], axis=1)
+
+        with mpi.span("compute"):
+            gram[blocks[a], blocks[b]] = xa.T @ xb
+            gram[blocks[b], blocks[a]] = gram[blocks[a], blocks[b]].T
+        log.log(f"Modal: Gram block ({a}, {b}) of {len(blocks)} x {len(blocks)}")
+    del cached
+
+    return mpi.reduce_arrays(gram)
+
+
+# linear combinations of the snapshots, coefs: [nt, nmode], written as one raw vtr per mode to paths,
+# k slabs of tile cells are dispatched over the ranks, each reads its slab of every frame and writes
+# the combined slabs in place, so a rank holds nmode + 1 slabs and no full mode is ever assembled
+# the weights cancel in the combination, so the slabs are combined unweighted
+def combine_snapshots(snapshots, coefs, paths, tile=4):
+    parts = ["real", "imag"] if np.iscomplexobj(coefs) else [None]
+
+    def out_name(name, part):
+        return name if part is None else f"{name}_{part}"
+
+    if mpi.is_host():
+        cell_arrays = {
+            out_name(name, part): (np.float64, tensor_shape)
+            for name, tensor_shape in snapshots.specs()
+            for part in parts
+        }
+        for path in paths:
+            RawVTRWriter(path, *snapshots.grid, cell_arrays).close()
+    mpi.barrier()
+
+    nz = snapshots.grid[2].shape[0] - 1
+    slabs = [(k0, min(k0 + tile, nz)) for k0 in range(0, nz, tile)]
+    headers = None
+    for k0, k1 in mpi.dispatch(slabs):
+        if headers is None:
+            headers = [read_raw_vtr_header(path) for path in paths]
+
+        combined = None
+        for it in range(snapshots.nt):
+            values = snapshots.read_tile(it, k0, k1)
+            with mpi.span("compute"):
+                if combined is None:
+                    combined = {
+                        name: np.zeros((len(paths),) + v.shape, dtype=coefs.dtype)
+                        for name, v in values.items()
+                    }
+                for name, v in values.items():
+                    for m in range(len(paths)):
+                        combined[name][m] += coefs[it, m] * v
+
+        with mpi.span("write"):
+            for m, (path, header) in enumerate(zip(paths, headers)):
+                for name, modes in combined.items():
+                    for part in parts:
+                        values = modes[m] if part is None else getattr(modes[m], part)
+                        write_raw_vtr_kslab(
+                            path, out_name(name, part), k0, values, header
+                        )
+        log.log(f"Modal: Combined k slab [{k0}, {k1}) of {nz} cells")
+    mpi.barrier()
+
+
+# snapshot pod of the fluctuations about the mean, from the eigen decomposition of the centered gram matrix
+# returns eigenvalues [nmode], temporal coefficients [nt, nmode] and the mean and mode combination coefs
+def pod_from_gram(gram, nmode):
+    nt = gram.shape[0]
+    center = np.eye(nt) - np.ones((nt, nt)) / nt
+    eigvals, eigvecs = np.linalg.eigh(center @ gram @ center)
+    order = np.argsort(eigvals)[::-1][:nmode]
+    eigvals = np.clip(eigvals[order], 0, None)
+    eigvecs = eigvecs[:, order]
+
+    scale = np.where(eigvals > 0, 1 / np.sqrt(np.where(eigvals > 0, eigvals, 1)), 0)
+    # the eigenvectors are orthogonal to the constant vector, so the mean drops out of the modes
+    coefs = np.concatenate([np.full((nt, 1), 1 / nt), eigvecs * scale], axis=1)
+    return eigvals, eigvecs * np.sqrt(eigvals), coefs
+
+
+# dmd from the gram matrix of consecutive frames, X1 = x[:-1], X2 = x[1:], truncated to rank
+# returns eigenvalues mu [r], amplitudes [r] and the mode combination coefs [nt, r] of X1
+def dmd_from_gram(gram, rank=None, rtol=1e-10):
+    g11 = gram[:-1, :-1]
+    g12 = gram[:-1, 1:]
+    s2, v = np.linalg.eigh(g11)
+    order = np.argsort(s2)[::-1]
+    s2, v = s2[order], v[:, order]
+    keep = s2 > rtol * s2[0]
+    if rank is not None:
+        keep[rank:] = False
+    sigma = np.sqrt(s2[keep])
+    v = v[:, keep]
+
+    atilde = (v.T @ g12 @ v) / np.outer(sigma, sigma)
+    mu, w = np.linalg.eig(atilde)
+
+    # projected modes X1 V S^-1 w, amplitudes fitted to the first frame
+    coefs1 = (v / sigma) @ w
+    amplitudes = np.linalg.solve(w, (v.T @ gram[:-1, 0]) / sigma)
+
+    coefs = np.zeros((gram.shape[0], mu.shape[0]), dtype=complex)
+    coefs[:-1] = coefs1
+    return mu, amplitudes, coefs
+
+
+# modal decomposition of the dump series without stacking the frames
+# method: "pod" of the fluctuations or "dmd", nmode: modes written, by energy for pod, by amplitude for dmd
+# fields: stacked into one snapshot vector, inner products weighted by the cell volume
+# bounds: [x1, x2, y1, y2, z1, z2] region of interest, block: frames per block of the gram pairs
+# tile: k cells per slab of the mode combination, every slab reads its part of all frames
+# dt: time step for the dmd frequencies, the case input dt if not specified
+# out_dir: FieldsFiles if not specified, writes fields.{method}.{k}.vtr as uncompressed raw vtrs
+#          and the spectra as fields.{method}.npz
+def create_modal_fields(
+    c,
+    method="pod",
+    nmode=10,
+    vtks=None,
+    fields=("VEL",),
+    bounds=None,
+    block=16,
+    tile=4,
+    dt=None,
+    out_dir=None,
+):
+    vtks = get_vtks_series(c, vtks)
+    out_dir = Path(c.path / "FieldsFiles" if out_dir is None else out_dir)
+    snapshots = Snapshots(vtks, fields, bounds)
+
+    gram = gram_matrix(snapshots, block)
+    tsteps = np.array([vtk.tstep for vtk in vtks])
+
+    if method == "pod":
+        eigvals, temporal, coefs = pod_from_gram(gram, nmode)
+        spectra = {"tstep": tsteps, "eigvals": eigvals, "temporal": temporal}
+        names = ["mean"] + [str(k) for k in range(eigvals.shape[0])]
+        energy = eigvals / max(eigvals.sum(), np.finfo(float).tiny)
+        log.log_host(f"Modal: POD energy fractions {np.round(energy, 4).tolist()}")
+    elif method == "dmd":
+        if dt is None:
+            dt = c.input.timeStep.dt.value
+            log.log_host(f"Modal: Using dt = {dt} of the case input")
+        mu, amplitudes, coefs = dmd_from_gram(gram, rank=None)
+        order = np.argsort(np.abs(amplitudes))[::-1][:nmode]
+        mu, amplitudes, coefs = mu[order], amplitudes[order], coefs[:, order]
+        omega = np.log(mu.astype(complex)) / frame_interval(tsteps, dt)
+        spectra = {
+            "tstep": tsteps,
+            "mu": mu,
+            "amplitudes": amplitudes,
+            "growth": omega.real,
+            "freq": omega.imag / (2 * np.pi),
+        }
+        names = [str(k) for k in range(mu.shape[0])]
+        log.log_host(f"Modal: DMD frequencies {np.round(spectra['freq'], 4).tolist()}")
+    else:
+        raise ValueError(f"Expected method = pod or dmd, but encountered {method}")
+
+    paths = [out_dir / f"fields.{method}.{name}.vtr" for name in names]
+    combine_snapshots(snapshots, coefs, paths, tile)
+    log.log(f"Modal: {snapshots.nread} frame reads on this rank")
+
+    if mpi.is_host():
+        np.savez(out_dir / f"fields.{method}.npz", **spectra)
+        nmean = names.count("mean")
+        log.log(
+            f"Modal: Written {len(paths) - nmean} modes{' and the mean' if nmean else ''} to {out_dir}"
+        )
+    mpi.barrier()
+
+    return spectra
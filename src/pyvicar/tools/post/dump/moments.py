@@ -0,0 +1,136 @@
+import numpy as np
+import pyvicar.tools.log as log
+import pyvicar.tools.mpi as mpi
+from .preprocesses.data import get_vtks_series, read_grid_frame, write_grid_fields
+
+_cross_comps = {"u": 0, "v": 1, "w": 2}
+
+
+# running per-cell mean, variance and cross-covariance of vector components over frames by Welford updates
+class FieldMoments:
+    # cross: {name: ["uv", "uw", "vw"]} component pairs of vector fields
+    def __init__(self, cross=None):
+        cross = {} if cross is None else cross
+        self._cross = {name: list(pairs) for name, pairs in cross.items()}
+        for name, pairs in self._cross.items():
+            for pair in pairs:
+                if len(pair) != 2 or any(p not in _cross_comps for p in pair):
+                    raise ValueError(
+                        f"Expected component pairs of u, v, w such as uv for {name}, but encountered {pair}"
+                    )
+        self._n = 0
+        self._mean = {}
+        self._m2 = {}
+        self._c = {}  # {(name, pair): co-moment}
+
+    @property
+    def n(self):
+        return self._n
+
+    def _allocate(self, name, shape):
+        self._mean[name] = np.zeros(shape)
+        self._m2[name] = np.zeros(shape)
+        for pair in self._cross.get(name, []):
+            self._c[(name, pair)] = np.zeros(shape[:3])
+
+    # arrays: {name: [i, j, k, (comp)]} of one frame
+    def add(self, arrays):
+        self._n += 1
+        for name, values in arrays.items():
+            values = np.asarray(values, dtype=np.float64)
+            if name not in self._mean:
+                self._allocate(name, values.shape)
+
+            mean = self._mean[name]
+            delta = values - mean
+            mean += delta / self._n
+            delta_new = values - mean
+            self._m2[name] += delta * delta_new
+            for pair in self._cross.get(name, []):
+                a, b = (_cross_comps[p] for p in pair)
+                self._c[(name, pair)] += delta[..., a] * delta_new[..., b]
+
+    # merges the partial moments of all ranks, the same as the pairwise Chan merge but
+    # in two sum reductions: the global mean first, then the squares about it
+    def allreduce(self):
+        ntotal = mpi.comm().allreduce(self._n)
+        shapes = {}
+        for part in mpi.comm().allgather({k: v.shape for k, v in self._mean.items()}):
+            shapes.update(part)
+        for name, shape in shapes.items():
+            if name not in self._mean:
+                self._allocate(name, shape)
+        if ntotal == 0:
+            return
+
+        for name in sorted(shapes):
+            mean = mpi.reduce_arrays(self._mean[name] * self._n)
+            mean /= ntotal
+
+            delta = self._mean[name] - mean
+            m2 = mpi.reduce_arrays(self._m2[name] + self._n * delta * delta)
+
+            for pair in self._cross.get(name, []):
+                a, b = (_cross_comps[p] for p in pair)
+                c = self._c[(name, pair)] + self._n * delta[..., a] * delta[..., b]
+                self._c[(name, pair)] = mpi.reduce_arrays(c)
+
+            self._mean[name] = mean
+            self._m2[name] = m2
+        self._n = ntotal
+
+    # {NAME_mean, NAME_rms, NAME_uv...}: mean, rms of the fluctuation and the mean fluctuation products
+    def results(self):
+        arrays = {}
+        for name in self._mean:
+            arrays[f"{name}_mean"] = self._mean[name]
+            arrays[f"{name}_rms"] = np.sqrt(self._m2[name] / self._n)
+            for pair in self._cross.get(name, []):
+                arrays[f"{name}_{pair}"] = self._c[(name, pair)] / self._n
+        return arrays
+
+
+# time-averaged fields over the dump series, each rank accumulates its share of frames
+# vtks: frames, all vtrs or else vtms of the case if not specified
+# cross: {name: ["uv", ...]} reynolds stress components of vector fields, uv, uw, vw of VEL if not specified
+# bounds: [x1, x2, y1, y2, z1, z2] region of interest
+# out_path: .vtr, or .h5 to write into the group of a field store, FieldsFiles/fields.moments.vtr if not specified
+def create_moment_fields(
+    c,
+    vtks=None,
+    fields=("VEL", "P"),
+    cross=None,
+    bounds=None,
+    out_path=None,
+    group="moments",
+):
+    vtks = get_vtks_series(c, vtks)
+    fields = list(fields)
+    if cross is None:
+        cross = {"VEL": ["uv", "uw", "vw"]}
+    if out_path is None:
+        out_path = c.path / "FieldsFiles" / "fields.moments.vtr"
+
+    moments = FieldMoments(cross)
+    grid = None
+    for vtk in mpi.dispatch(vtks):
+        log.log(f"Moments: Accumulating {vtk}")
+        frame = read_grid_frame(vtk, fields, bounds)
+        with mpi.span("compute"):
+            moments.add(frame.cell_data)
+        grid = (frame.x, frame.y, frame.z)
+        del frame
+
+    moments.allreduce()
+    log.log_host(f"Moments: Merged {moments.n} frames")
+
+    if mpi.is_host():
+        if grid is None:
+            # geometry only
+            frame = read_grid_frame(vtks[0], [], bounds)
+            grid = (frame.x, frame.y, frame.z)
+        write_grid_fields(out_path, *grid, moments.results(), group)
+        log.log(f"Moments: Written to {out_path}")
+    mpi.barrier()
+
+    return out_path
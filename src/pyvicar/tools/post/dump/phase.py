@@ -0,0 +1,113 @@
+import numpy as np
+from pathlib import Path
+import pyvicar.tools.log as log
+import pyvicar.tools.mpi as mpi
+from .preprocesses.data import get_vtks_series, read_grid_frame, write_grid_fields
+
+
+# phase bin of each tstep, bin i is centered at phase i / nphase of the period
+def phase_bins(tsteps, dt, period, nphase, t0=0.0):
+    phase = np.mod((np.asarray(tsteps) * dt - t0) / period, 1.0)
+    return np.round(phase * nphase).astype(int) % nphase
+
+
+# running per-cell mean of each phase bin, every frame is added once to its bin
+class PhaseAverages:
+    def __init__(self, nphase):
+        self._nphase = nphase
+        self._counts = np.zeros(nphase, dtype=int)
+        self._means = [{} for _ in range(nphase)]
+
+    @property
+    def counts(self):
+        return self._counts
+
+    # arrays: {name: [i, j, k, (comp)]} of one frame
+    def add(self, iphase, arrays):
+        self._counts[iphase] += 1
+        means = self._means[iphase]
+        for name, values in arrays.items():
+            values = np.asarray(values, dtype=np.float64)
+            if name not in means:
+                means[name] = np.zeros(values.shape)
+            means[name] += (values - means[name]) / self._counts[iphase]
+
+    # merges the partial means of all ranks weighted by their counts
+    def allreduce(self):
+        shapes = {}
+        for part in mpi.comm().allgather(
+            {k: v.shape for means in self._means for k, v in means.items()}
+        ):
+            shapes.update(part)
+
+        counts = mpi.reduce_arrays(self._counts.copy())
+
+        for iphase, means in enumerate(self._means):
+            for name in sorted(shapes):
+                total = means.get(name, np.zeros(shapes[name])) * self._counts[iphase]
+                total = mpi.reduce_arrays(total)
+                if counts[iphase]:
+                    total /= counts[iphase]
+                means[name] = total
+        self._counts = counts
+
+    # [{name: mean}] per phase, empty bins are zero with a count of 0
+    def results(self):
+        return self._means
+
+
+# phase-averaged fields of a periodic motion, each frame is read once by the rank it is dispatched to
+# period: in time units, dt: time step, the case input dt if not specified, t0: time of phase 0
+# out_path: .vtr written as one file per phase e.g. fields.phase.0.vtr,
+# or .h5 to write into groups group/0, group/1... of a field store, None to keep in memory only
+# returns [{name: mean}] per phase and the number of frames in each
+def create_phase_fields(
+    c,
+    period,
+    nphase=8,
+    dt=None,
+    t0=0.0,
+    vtks=None,
+    fields=("VEL", "P"),
+    bounds=None,
+    out_path=None,
+    group="phases",
+):
+    vtks = get_vtks_series(c, vtks)
+    fields = list(fields)
+    if dt is None:
+        dt = c.input.timeStep.dt.value
+        log.log_host(f"Phase Average: Using dt = {dt} of the case input")
+
+    bins = phase_bins([vtk.tstep for vtk in vtks], dt, period, nphase, t0)
+
+    phases = PhaseAverages(nphase)
+    grid = None
+    for vtk, iphase in mpi.dispatch(zip(vtks, bins)):
+        log.log(f"Phase Average: Adding {vtk} to phase {iphase}")
+        frame = read_grid_frame(vtk, fields, bounds)
+        with mpi.span("compute"):
+            phases.add(iphase, frame.cell_data)
+        grid = (frame.x, frame.y, frame.z)
+        del frame
+
+    phases.allreduce()
+    log.log_host(f"Phase Average: Frames per phase {phases.counts.tolist()}")
+
+    if out_path is not None and mpi.is_host():
+        if grid is None:
+            # geometry only
+            frame = read_grid_frame(vtks[0], [], bounds)
+            grid = (frame.x, frame.y, frame.z)
+
+        out_path = Path(out_path)
+        for iphase, means in enumerate(phases.results()):
+            if out_path.suffix == ".h5":
+                write_grid_fields(out_path, *grid, means, f"{group}/{iphase}")
+            else:
+                path = out_path.with_name(f"{out_path.stem}.{iphase}{out_path.suffix}")
+                write_grid_fields(path, *grid, means)
+        log.log(f"Phase Average: Written to {out_path}")
+    mpi.barrier()
+
+    return phases.results(), phases.counts
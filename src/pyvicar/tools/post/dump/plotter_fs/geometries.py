@@ -1,8 +1,10 @@
 import numpy as np
-import pyvista as pv
+from pyvicar._utilities import lazy_import
 import pyvicar.tools.fp as fp
 from pyvicar.tools.post.dump.preprocesses.conversions import vecstr_to_array
 
+pv = lazy_import("pyvista")
+
 
 def make_plane_plotter_f(
     xyz_f,
@@ -1,7 +1,14 @@
 import numpy as np
-import pyvista as pv
+from pyvicar._utilities import lazy_import
+from pathlib import Path
+from dataclasses import dataclass
 from collections.abc import Iterable
 import pyvicar.tools.post.dump.labels as lb
+import pyvicar.tools.mpi as mpi
+from pyvicar.tools.vtk import crop_slices
+from pyvicar.tools.fieldstore import write_field_group
+
+pv = lazy_import("pyvista")
 
 
 def prep_field(mesh, field):
@@ -32,6 +39,16 @@ def prep_field(mesh, field):
     return mesh
 
 
+# dumped arrays needed by the labels, in order without duplicates
+def unique_sources(*labels):
+    sources = []
+    for label in labels:
+        for name in label.sources():
+            if name not in sources:
+                sources.append(name)
+    return sources
+
+
 def get_vtks_markers(c, vtks, markers):
     if vtks is None:
         c.dump.vtm.read()
@@ -58,3 +75,96 @@ def get_vtks_markers(c, vtks, markers):
         )
 
     return c, vtks, markers
+
+
+# all frames of the structured dump, vtr if converted, otherwise vtm
+def get_vtks_series(c, vtks):
+    if vtks is not None:
+        return list(vtks)
+
+    c.dump.vtr.read()
+    if c.dump.vtr:
+        return list(c.dump.vtr)
+    c.dump.vtm.read()
+    if c.dump.vtm:
+        # the stored layout makes the vtms read as rectilinear frames
+        c.dump.vtm.layout()
+        return list(c.dump.vtm)
+    raise Exception(
+        f"Field Series: No VTR or VTM available, or pass VTK lists by vtks=..."
+    )
+
+
+# time between frames of a series dumped at a fixed tstep interval
+def frame_interval(tsteps, dt):
+    steps = np.diff(np.asarray(tsteps))
+    if steps.size and np.any(steps != steps[0]):
+        raise ValueError(
+            f"Field Series: Needs equally spaced frames, but the tstep intervals are {sorted(set(steps.tolist()))}"
+        )
+    return (steps[0] if steps.size else 1) * dt
+
+
+# cell fields of a rectilinear frame indexed [i, j, k, (comp)]
+@dataclass
+class GridFrame:
+    x: np.ndarray
+    y: np.ndarray
+    z: np.ndarray
+    cell_data: dict
+
+    @property
+    def shape(self):
+        return (self.x.shape[0] - 1, self.y.shape[0] - 1, self.z.shape[0] - 1)
+
+
+# raw vtrs are mapped so a bounds crop only reads the pages it touches,
+# other frames are decoded with the unrequested fields switched off
+@mpi.span("read")
+def read_grid_frame(vtk, fields, bounds=None):
+    if hasattr(vtk, "to_memmap"):
+        try:
+            raw = vtk.to_memmap(fields)
+        except ValueError:
+            raw = None
+        if raw is not None:
+            if bounds is None:
+                return GridFrame(raw.x, raw.y, raw.z, raw.cell_data)
+            crop = crop_slices(raw.x, raw.y, raw.z, bounds)
+            coords = [
+                c[s.start : s.stop + 1] for c, s in zip((raw.x, raw.y, raw.z), crop)
+            ]
+            return GridFrame(
+                *coords, {name: v[crop + (...,)] for name, v in raw.cell_data.items()}
+            )
+
+    if bounds is None:
+        mesh = vtk.to_pyvista(fields=fields)
+    else:
+        mesh = vtk.to_pyvista(fields=fields, bounds=bounds)
+    if not hasattr(mesh, "x"):
+        raise TypeError(
+            f"Field series needs rectilinear frames, but {vtk} is {type(mesh).__name__}, use vtr or vtm with a layout"
+        )
+
+    shape = tuple(n - 1 for n in mesh.dimensions)
+    cell_data = {}
+    for name in fields:
+        values = mesh.cell_data[name]
+        cell_data[name] = values.reshape(shape + values.shape[1:], order="F")
+    return GridFrame(mesh.x, mesh.y, mesh.z, cell_data)
+
+
+# arrays: {name: [i, j, k, (comp)]}, written as a vtr, or into group of a hdf5 file such as the field store
+def write_grid_fields(path, x, y, z, arrays, group=None):
+    path = Path(path)
+    if path.suffix == ".h5":
+        write_field_group(path, group, x, y, z, arrays)
+        return
+
+    mesh = pv.RectilinearGrid(x, y, z)
+    for name, values in arrays.items():
+        mesh.cell_data[name] = values.reshape(
+            (mesh.n_cells,) + values.shape[3:], order="F"
+        )
+    mesh.save(path, binary=True)
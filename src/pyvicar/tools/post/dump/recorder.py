@@ -42,7 +42,8 @@ def create_recorder_video(
         )
         s = slice_by_t(ts, t1, t)
 
-        fig = fig_f(ts[s], *(v[s] for v in vs))
+        with mpi.span("compute"):
+            fig = fig_f(ts[s], *(v[s] for v in vs))
 
         a.frames.frame_by_matplotlib(i, fig)
 
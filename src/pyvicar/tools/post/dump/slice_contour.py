@@ -1,11 +1,13 @@
-import pyvista as pv
+from pyvicar._utilities import lazy_import
 import pyvicar.tools.log as log
 import pyvicar.tools.mpi as mpi
 from . import labels as lb
 from pyvicar.tools.miscellaneous import args
-from .preprocesses.data import prep_field, get_vtks_markers
+from .preprocesses.data import prep_field, get_vtks_markers, unique_sources
 from .preprocesses.conversions import normal_to_plane, resolution_to_size
 
+pv = lazy_import("pyvista")
+
 
 # make the slice contour
 def create_slice(
@@ -68,6 +70,8 @@ def create_slicecontour_video(
     if clip_f is None:
         clip_f = lambda c, i, v, m: clip
 
+    fields = unique_sources(contour_color)
+
     mpi.set_async()
 
     for i, (vtk, marker) in mpi.dispatch(enumerate(zip(vtks, markers))):
@@ -75,12 +79,14 @@ def create_slicecontour_video(
             f"Slice Contour Video: Posting frame {i} {vtk}{f' with {marker}' if marker is not None else ''}"
         )
 
-        mesh = vtk.to_pyvista()
-        mesh = mesh.cell_data_to_point_data(pass_cell_data=False)
+        with mpi.span("read"):
+            mesh = vtk.to_pyvista(fields=fields)
+            bodies = None if marker is None else marker.to_pyvista_multiblocks()
+        with mpi.span("compute"):
+            mesh = mesh.cell_data_to_point_data(pass_cell_data=False)
         plotter = pv.Plotter(off_screen=True)
 
         if marker is not None:
-            bodies = marker.to_pyvista_multiblocks()
             bodies = marker_f(c, i, vtk, bodies)
             for body in bodies:
                 if isinstance(marker_color, lb.ColorField):
@@ -100,7 +106,8 @@ def create_slicecontour_video(
 
         origin_t = origin_f(c, i, vtk, marker)
         clip_t = clip_f(c, i, vtk, marker)
-        slice = create_slice(mesh, normal, origin_t, clip_t)
+        with mpi.span("compute"):
+            slice = create_slice(mesh, normal, origin_t, clip_t)
         if slice.n_points == 0 or slice.n_cells == 0:
             log.log(f"Slice Contour Video: Empty slice")
         else:
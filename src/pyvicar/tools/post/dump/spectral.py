@@ -0,0 +1,183 @@
+import numpy as np
+from pathlib import Path
+from pyvicar._utilities import lazy_import
+import pyvicar.tools.log as log
+import pyvicar.tools.mpi as mpi
+from pyvicar.tools.vtk import crop_slices
+from pyvicar.tools.fieldstore import FieldStore
+from .preprocesses.data import (
+    get_vtks_series,
+    frame_interval,
+    read_grid_frame,
+    write_grid_fields,
+)
+
+signal = lazy_import("scipy.signal")
+
+
+# per-cell welch psd of a batch of time series and the maps derived from it
+# fs: frame rate, nperseg: welch segment length, the whole series if not specified
+# bands: [(f1, f2)] frequency bands of the band energy maps, fmin: lowest frequency for the peak search
+class SpectralMaps:
+
+    def __init__(self, fs, nt, nperseg=None, bands=(), fmin=0.0):
+        self._fs = fs
+        self._nperseg = nt if nperseg is None else min(nperseg, nt)
+        self._bands = [tuple(band) for band in bands]
+        self._fmin = fmin
+
+        win = signal.get_window("hann", self._nperseg)
+        # density to spectrum scaling, a sinusoid of amplitude A peaks at A^2 / 2 in the spectrum
+        self._spectrum_scale = fs * np.sum(win**2) / np.sum(win) ** 2
+        self.freqs = np.fft.rfftfreq(self._nperseg, d=1 / fs)
+
+    def names(self, field):
+        return [f"{field}_peak_freq", f"{field}_peak_amp", f"{field}_energy"] + [
+            f"{field}_band_{f1:g}_{f2:g}" for f1, f2 in self._bands
+        ]
+
+    # series: [nt, i, j, k, (comp)], vector fields sum the psd of their components
+    # returns {name: [i, j, k]}
+    def compute(self, field, series):
+        spatial = series.shape[1:4]
+        series = series.reshape(series.shape[:4] + (-1,))
+        freqs, psd = signal.welch(
+            series,
+            fs=self._fs,
+            window="hann",
+            nperseg=self._nperseg,
+            detrend="constant",
+            axis=0,
+        )
+        psd = psd.sum(axis=-1)
+        df = freqs[1] - freqs[0] if freqs.shape[0] > 1 else 0.0
+
+        search = freqs > max(self._fmin, 0.0)
+        if not np.any(search):
+            raise ValueError(
+                f"No frequency above fmin = {self._fmin} with {self._nperseg} frames per segment at fs = {self._fs}"
+            )
+        ipeak = np.argmax(psd[search], axis=0)
+        peak = np.take_along_axis(psd[search], ipeak[None], axis=0)[0]
+
+        maps = {
+            f"{field}_peak_freq": freqs[search][ipeak],
+            f"{field}_peak_amp": np.sqrt(2 * peak * self._spectrum_scale),
+            f"{field}_energy": psd[1:].sum(axis=0) * df,
+        }
+        for f1, f2 in self._bands:
+            inband = (freqs >= f1) & (freqs < f2)
+            maps[f"{field}_band_{f1:g}_{f2:g}"] = psd[inband].sum(axis=0) * df
+
+        return {name: values.reshape(spatial) for name, values in maps.items()}
+
+
+# k-slab tiles of the region across all frames, raw vtrs only read the pages of the tile
+class _FrameTiles:
+    def __init__(self, vtks, field, bounds):
+        self._vtks = vtks
+        self._field = field
+        frame = read_grid_frame(vtks[0], [], bounds)
+        self.grid = (frame.x, frame.y, frame.z)
+        self.tsteps = np.array([vtk.tstep for vtk in vtks])
+
+    def read(self, k0, k1):
+        x, y, z = self.grid
+        bounds = [x[0], x[-1], y[0], y[-1], z[k0], z[k1]]
+        return np.stack(
+            [
+                np.asarray(
+                    read_grid_frame(vtk, [self._field], bounds).cell_data[self._field]
+                )
+                for vtk in self._vtks
+            ],
+            axis=0,
+        )
+
+
+# hyperslabs of the chunked field store, only the chunks the tile touches are read
+class _StoreTiles:
+    def __init__(self, store, field, bounds):
+        self._store = store
+        self._field = field
+        x, y, z = store.x, store.y, store.z
+        if bounds is None:
+            self._crop = tuple(slice(0, c.shape[0] - 1) for c in (x, y, z))
+        else:
+            self._crop = crop_slices(x, y, z, bounds)
+        self.grid = tuple(
+            c[s.start : s.stop + 1] for c, s in zip((x, y, z), self._crop)
+        )
+        self.tsteps = store.tstep
+
+    @mpi.span("read")
+    def read(self, k0, k1):
+        ci, cj, ck = self._crop
+        k = slice(ck.start + k0, ck.start + k1)
+        return self._store.slab(self._field, i=ci, j=cj, k=k)
+
+
+# dominant frequency, its amplitude and band energies of a field in every cell
+# the region is split into k-slab tiles of tile cells, the tiles are dispatched over the ranks and
+# each reads its slab across all frames, so only nt x tile planes are in memory at a time
+# store: path of a field store (e.g. c.dump.vtm.h5_path) to read from, else the vtks frames
+# dt: time step, the case input dt if not specified, nperseg, bands, fmin: see SpectralMaps
+# out_path: .vtr, or .h5 to write into the group of a field store, FieldsFiles/fields.spectral.vtr if not specified
+def create_spectral_fields(
+    c,
+    field="VEL",
+    vtks=None,
+    store=None,
+    bounds=None,
+    dt=None,
+    nperseg=None,
+    bands=(),
+    fmin=0.0,
+    tile=4,
+    out_path=None,
+    group="spectral",
+):
+    if dt is None:
+        dt = c.input.timeStep.dt.value
+        log.log_host(f"Spectral: Using dt = {dt} of the case input")
+    if out_path is None:
+        out_path = c.path / "FieldsFiles" / "fields.spectral.vtr"
+
+    h5 = None
+    if store is not None:
+        h5 = FieldStore(store)
+        tiles = _StoreTiles(h5, field, bounds)
+    else:
+        tiles = _FrameTiles(get_vtks_series(c, vtks), field, bounds)
+
+    nt = tiles.tsteps.shape[0]
+    if nt < 2:
+        raise ValueError(f"Spectral: Needs at least 2 frames, but encountered {nt}")
+    fs = 1 / frame_interval(tiles.tsteps, dt)
+    spectral = SpectralMaps(fs, nt, nperseg, bands, fmin)
+
+    x, y, z = tiles.grid
+    shape = (x.shape[0] - 1, y.shape[0] - 1, z.shape[0] - 1)
+    maps = {name: np.zeros(shape) for name in spectral.names(field)}
+    ktiles = [(k0, min(k0 + tile, shape[2])) for k0 in range(0, shape[2], tile)]
+
+    for k0, k1 in mpi.dispatch(ktiles):
+        log.log(f"Spectral: Tile k = [{k0}, {k1}) of {shape[2]} over {nt} frames")
+        series = tiles.read(k0, k1)
+        with mpi.span("compute"):
+            for name, values in spectral.compute(field, series).items():
+                maps[name][:, :, k0:k1] = values
+        del series
+
+    if h5 is not None:
+        h5.close()
+
+    # tiles are disjoint, the sum assembles the maps
+    maps = mpi.reduce_arrays(maps)
+
+    if mpi.is_host():
+        write_grid_fields(Path(out_path), x, y, z, maps, group)
+        log.log(f"Spectral: Written {list(maps)} to {out_path}")
+    mpi.barrier()
+
+    return spectral.freqs, maps
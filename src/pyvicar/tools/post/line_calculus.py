@@ -1,6 +1,9 @@
-import pyvista as pv
+from __future__ import annotations
+from pyvicar._utilities import lazy_import
 import numpy as np
 
+pv = lazy_import("pyvista")
+
 
 def get_full_sample(sample):
     full_sample = sample
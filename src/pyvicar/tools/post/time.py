@@ -1,10 +1,12 @@
 import numpy as np
-from scipy.signal import butter, filtfilt
+from pyvicar._utilities import lazy_import
 from abc import ABC, abstractmethod
 from pyvicar.tools.collections import struct
 from itertools import product
 import pyvicar.tools.log as log
 
+signal = lazy_import("scipy.signal")
+
 
 def slice_by_t(x, x1, x2):
     i1 = None
@@ -45,14 +47,14 @@ def tfourier(ft, dt, mag=True):
 class TFilter(ABC):
     @abstractmethod
     def filt(self, ft):
-        return filtfilt(self._b, self._a, ft)
+        return signal.filtfilt(self._b, self._a, ft)
 
     def butter(time, cutoff_period, order=4):
         order = 4
         cutoff_freq = 1 / cutoff_period
         fs = (time.shape[0] - 1) / (time[-1] - time[0])
         nyq = fs / 2
-        b, a = butter(order, cutoff_freq / nyq, btype="low")
+        b, a = signal.butter(order, cutoff_freq / nyq, btype="low")
         return TFilterBA(b, a)
 
 
@@ -67,7 +69,7 @@ class TFilterBA(TFilter):
         self._a = a
 
     def filt(self, ft):
-        return filtfilt(self._b, self._a, ft)
+        return signal.filtfilt(self._b, self._a, ft)
 
 
 def tfilter_mean(ft, window_size=5, mode="same"):
@@ -0,0 +1,95 @@
+import numpy as np
+from dataclasses import dataclass
+from pyvicar.tools.log import log
+
+
+# lossy storage of a float field, the stored values differ from the original by at most
+# atol: absolute error, values are rounded to a power of two step so the trailing mantissa bits are zero
+# rtol: error relative to each value, the mantissa bits beyond it are zeroed
+# dtype: downcast applied after the rounding, e.g. "float32", with its own rounding error on top
+# the zeroed bits are what the vtk compressor then removes
+@dataclass
+class Precision:
+    dtype: str = None
+    atol: float = None
+    rtol: float = None
+
+    def to_dict(self):
+        return {
+            "dtype": None if self.dtype is None else np.dtype(self.dtype).name,
+            "atol": self.atol,
+            "rtol": self.rtol,
+        }
+
+
+# precision: a Precision for all float fields, or {name: Precision} for some of them, None for lossless
+def field_precision(precision, name):
+    if precision is None or isinstance(precision, Precision):
+        return precision
+    return precision.get(name)
+
+
+# json-able form recorded in the conversion manifest
+def precision_options(precision):
+    if precision is None or isinstance(precision, Precision):
+        return None if precision is None else precision.to_dict()
+    return {name: p.to_dict() for name, p in precision.items()}
+
+
+def stored_dtype(dtype, precision):
+    dtype = np.dtype(dtype)
+    if precision is None or precision.dtype is None:
+        return dtype
+    if not np.issubdtype(dtype, np.floating):
+        return dtype
+    return np.dtype(precision.dtype)
+
+
+def reduce_precision(values, precision):
+    if precision is None or not np.issubdtype(values.dtype, np.floating):
+        return values
+
+    reduced = values
+    if precision.atol is not None:
+        step = 2.0 ** np.floor(np.log2(2 * precision.atol))
+        reduced = np.round(reduced / step) * step
+    if precision.rtol is not None:
+        nbits = int(np.ceil(-np.log2(precision.rtol)))
+        mantissa, exponent = np.frexp(reduced)
+        reduced = np.ldexp(np.round(mantissa * 2.0**nbits) / 2.0**nbits, exponent)
+
+    return reduced.astype(stored_dtype(values.dtype, precision), copy=False)
+
+
+# max and rms error introduced per field, accumulated over blocks and files
+class PrecisionErrors:
+    def __init__(self):
+        self._stats = {}  # {name: [max, sum of squares, count]}
+
+    def add(self, name, values, reduced):
+        if reduced is values:
+            return
+        error = np.abs(reduced.astype(np.float64) - values)
+        self.merge_one(
+            name, [float(error.max(initial=0)), float(np.sum(error**2)), error.size]
+        )
+
+    def merge_one(self, name, stats):
+        if name not in self._stats:
+            self._stats[name] = list(stats)
+        else:
+            old = self._stats[name]
+            self._stats[name] = [
+                max(old[0], stats[0]),
+                old[1] + stats[1],
+                old[2] + stats[2],
+            ]
+
+    def merge(self, other):
+        for name, stats in other._stats.items():
+            self.merge_one(name, stats)
+
+    def log(self, prefix):
+        for name, (maxerr, sumsq, count) in self._stats.items():
+            rms = np.sqrt(sumsq / count) if count else 0.0
+            log(f"{prefix}: {name} max error {maxerr:.3e}, rms error {rms:.3e}")
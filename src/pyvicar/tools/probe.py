@@ -0,0 +1,138 @@
+import numpy as np
+import pyvicar.tools.mpi as mpi
+from pyvicar.tools.log import log
+
+
+def cell_centers(coords):
+    coords = np.asarray(coords)
+    return (coords[:-1] + coords[1:]) / 2
+
+
+# lower neighbour index and linear weight of the upper neighbour along one axis,
+# probes outside the first/last cell center take the boundary value
+def _axis_weights(centers, values):
+    n = centers.shape[0]
+    if n == 1:
+        return np.zeros(values.shape[0], dtype=int), np.zeros(values.shape[0])
+
+    i0 = np.clip(np.searchsorted(centers, values, side="right") - 1, 0, n - 2)
+    w1 = (values - centers[i0]) / (centers[i0 + 1] - centers[i0])
+    return i0, np.clip(w1, 0, 1)
+
+
+# sampler of cell fields of a fixed rectilinear grid at fixed probes,
+# the cell indices and trilinear weights are computed once and reused as a gather for every frame
+class ProbeEngine:
+    # i, j, k: [nprobe, ncorner] 0-based cell indices, weights: [nprobe, ncorner]
+    def __init__(self, shape, i, j, k, weights):
+        self._shape = tuple(shape)
+        self._i = i
+        self._j = j
+        self._k = k
+        self._weights = weights
+        # F-ordered flat index into vtk cell arrays
+        self._flat = i + shape[0] * (j + shape[1] * k)
+
+    @property
+    def nprobe(self):
+        return self._weights.shape[0]
+
+    @property
+    def shape(self):
+        return self._shape
+
+    # points: [nprobe, 3], trilinear between the cell centers of the grid with nodes x, y, z
+    @staticmethod
+    def from_points(x, y, z, points):
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        axes = [
+            _axis_weights(cell_centers(coords), points[:, axis])
+            for axis, coords in enumerate((x, y, z))
+        ]
+        shape = tuple(np.asarray(coords).shape[0] - 1 for coords in (x, y, z))
+
+        corners = [[], [], []]
+        weights = []
+        for di in (0, 1):
+            for dj in (0, 1):
+                for dk in (0, 1):
+                    weight = np.ones(points.shape[0])
+                    for axis, d in enumerate((di, dj, dk)):
+                        i0, w1 = axes[axis]
+                        corners[axis].append(np.minimum(i0 + d, shape[axis] - 1))
+                        weight = weight * (w1 if d else 1 - w1)
+                    weights.append(weight)
+
+        return ProbeEngine(
+            shape,
+            *(np.stack(c, axis=1) for c in corners),
+            np.stack(weights, axis=1),
+        )
+
+    # ijk: [nprobe, 3] cell indices in the layout of case.probe.Nodes, base: index of the first cell
+    @staticmethod
+    def from_ijk(shape, ijk, base=1):
+        ijk = np.atleast_2d(np.asarray(ijk, dtype=int)) - base
+        for axis in range(3):
+            if (
+                ijk[:, axis].min(initial=0) < 0
+                or ijk[:, axis].max(initial=0) >= shape[axis]
+            ):
+                raise ValueError(
+                    f"Probe indices along axis {axis} out of the grid of {shape[axis]} cells (base {base})"
+                )
+        return ProbeEngine(
+            shape,
+            ijk[:, 0:1],
+            ijk[:, 1:2],
+            ijk[:, 2:3],
+            np.ones((ijk.shape[0], 1)),
+        )
+
+    @staticmethod
+    def from_nodes(shape, nodes, base=1):
+        return ProbeEngine.from_ijk(shape, nodes.ijk.value, base)
+
+    # nearest cell of each probe in the layout of case.probe.Nodes, e.g. nodes.ijk = engine.ijk()
+    def ijk(self, base=1):
+        nearest = np.argmax(self._weights, axis=1)
+        rows = np.arange(self.nprobe)
+        return (
+            np.stack(
+                [
+                    self._i[rows, nearest],
+                    self._j[rows, nearest],
+                    self._k[rows, nearest],
+                ],
+                axis=1,
+            )
+            + base
+        )
+
+    # values: vtk cell array [ncell, (comp)] in F order, or a field indexed [i, j, k, (comp)] e.g. a memmap
+    # returns [nprobe, ncomp]
+    def sample(self, values):
+        if values.ndim >= 3 and values.shape[:3] == self._shape:
+            gathered = values[self._i, self._j, self._k]
+        else:
+            gathered = values[self._flat]
+        gathered = gathered.reshape(gathered.shape[:2] + (-1,))
+        return np.einsum("pc,pcn->pn", self._weights, gathered)
+
+
+# field of the frames of vtks at the probes, [nt, nprobe, ncomp]
+# frames are split over mpi ranks, raw vtrs are gathered thru memmap without reading whole frames
+def probe_frames(vtks, engine, field):
+    def sample(vtk):
+        log(f"Probe: Sampling {field} of {vtk}")
+        values = None
+        if hasattr(vtk, "to_memmap"):
+            try:
+                values = vtk.to_memmap(fields=[field]).cell_data[field]
+            except ValueError:
+                pass
+        if values is None:
+            values = vtk.to_pyvista(fields=[field]).cell_data[field]
+        return engine.sample(values)
+
+    return mpi.map(sample, vtks, root=None)
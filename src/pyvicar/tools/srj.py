@@ -1,11 +1,13 @@
 import shutil
 import re
-import h5py
+from pyvicar._utilities import lazy_import
 import numpy as np
 from dataclasses import dataclass
 from functools import partial
 import pyvicar.tools.log as log
 
+h5py = lazy_import("h5py")
+
 
 @dataclass
 class SRJParams:
@@ -0,0 +1,262 @@
+import json
+import hashlib
+import numpy as np
+from pyvicar._utilities import lazy_import
+from pathlib import Path
+
+pd = lazy_import("pandas")
+
+
+_vec_comps = ["X", "Y", "Z"]
+
+
+# the sidecar is shared by all formats of a frame, fields.N.vtm/.vtr/.lod4.vtr -> fields.N.stats.json
+def stats_path(path):
+    path = Path(path)
+    return path.with_name(".".join(path.name.split(".")[:2]) + ".stats.json")
+
+
+def file_checksums(paths, chunksize=1 << 20):
+    checksums = {}
+    for path in paths:
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            while chunk := f.read(chunksize):
+                h.update(chunk)
+        checksums[Path(path).name] = h.hexdigest()
+    return checksums
+
+
+# values: [n] scalar or [n, comp] vector, keyed as the fullname of the field labels,
+# e.g. P, VEL(X), VEL(Y), VEL(Z), VEL(MAG)
+def _components(name, values):
+    if values.ndim == 1:
+        yield name, values
+        return
+
+    values = values.reshape(values.shape[0], -1)
+    ncomp = values.shape[1]
+    for i in range(ncomp):
+        comp = _vec_comps[i] if ncomp == 3 else str(i)
+        yield f"{name}({comp})", values[:, i]
+    if ncomp == 3:
+        yield f"{name}(MAG)", np.linalg.norm(values, axis=1)
+
+
+# one pass histogram of at most bins bins on the grid origin + i * width,
+# the width is doubled by merging bin pairs whenever the values outgrow the bins, so the counts stay exact
+# and the edges cover min/max on that grid instead of spanning them exactly
+class GrowingHist:
+    def __init__(self, bins):
+        self._bins = max(bins, 2)
+        self._origin = None
+        self._width = None
+        self._i0 = 0
+        self._counts = np.zeros(0, dtype=np.int64)
+
+    def add(self, values):
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        if self._origin is None:
+            vmin, vmax = float(values.min()), float(values.max())
+            self._origin = vmin
+            # bins - 1 so that the max falls into the last bin
+            span = vmax - vmin if vmax > vmin else max(abs(vmin), 1.0)
+            self._width = span / (self._bins - 1)
+
+        idx = np.floor((values - self._origin) / self._width).astype(np.int64)
+        lo, hi = int(idx.min()), int(idx.max())
+        if self._counts.size:
+            lo, hi = min(lo, self._i0), max(hi, self._i0 + self._counts.size - 1)
+        while hi - lo + 1 > self._bins:
+            self._coarsen()
+            idx //= 2
+            lo, hi = lo // 2, hi // 2
+
+        counts = np.zeros(hi - lo + 1, dtype=np.int64)
+        start = self._i0 - lo
+        counts[start : start + self._counts.size] = self._counts
+        counts += np.bincount(idx - lo, minlength=counts.size)
+        self._i0, self._counts = lo, counts
+
+    def _coarsen(self):
+        self._width *= 2
+        i0 = self._i0 // 2
+        counts = np.zeros(
+            (self._i0 + self._counts.size - 1) // 2 - i0 + 1, dtype=np.int64
+        )
+        np.add.at(
+            counts, (self._i0 + np.arange(self._counts.size)) // 2 - i0, self._counts
+        )
+        self._i0, self._counts = i0, counts
+
+    def edges(self):
+        return (
+            self._origin + (self._i0 + np.arange(self._counts.size + 1)) * self._width
+        )
+
+    def counts(self):
+        return self._counts
+
+
+# per-field min, max, mean, l2 norm over cells and a histogram, accumulated block by block
+# add_hist takes edges spanning the final min/max, so a second pass after all add,
+# add(..., hist=True) accumulates a GrowingHist in the same pass instead
+class FrameStats:
+    def __init__(self, bins=64):
+        self._bins = bins
+        self._moments = {}  # {key: [min, max, sum, sum of squares, count]}
+        self._hists = {}
+        self._growing = {}
+
+    def add(self, name, values, hist=False):
+        for key, comp in _components(name, values):
+            comp = comp.astype(np.float64, copy=False)
+            moments = [
+                float(comp.min(initial=np.inf)),
+                float(comp.max(initial=-np.inf)),
+                float(comp.sum()),
+                float(np.dot(comp, comp)),
+                comp.size,
+            ]
+            self.merge_one(key, moments)
+            if hist:
+                self._growing.setdefault(key, GrowingHist(self._bins)).add(comp)
+
+    def merge_one(self, key, moments):
+        if key not in self._moments:
+            self._moments[key] = list(moments)
+        else:
+            old = self._moments[key]
+            self._moments[key] = [
+                min(old[0], moments[0]),
+                max(old[1], moments[1]),
+                old[2] + moments[2],
+                old[3] + moments[3],
+                old[4] + moments[4],
+            ]
+
+    def edges(self, key):
+        vmin, vmax = self._moments[key][:2]
+        if vmin == vmax:
+            vmax = vmin + 1
+        return np.linspace(vmin, vmax, self._bins + 1)
+
+    def add_hist(self, name, values):
+        for key, comp in _components(name, values):
+            counts, _ = np.histogram(comp, bins=self.edges(key))
+            if key not in self._hists:
+                self._hists[key] = counts
+            else:
+                self._hists[key] += counts
+
+    # cell fields of a full mesh, both passes
+    def add_mesh(self, mesh):
+        for name in mesh.cell_data:
+            self.add(name, mesh.cell_data[name])
+        for name in mesh.cell_data:
+            self.add_hist(name, mesh.cell_data[name])
+
+    def to_dict(self):
+        data = {}
+        for key, (vmin, vmax, vsum, vsumsq, count) in self._moments.items():
+            data[key] = {
+                "min": vmin,
+                "max": vmax,
+                "mean": vsum / count if count else None,
+                "l2": float(np.sqrt(vsumsq)),
+                "count": count,
+            }
+            if key in self._hists:
+                data[key]["hist"] = {
+                    "counts": self._hists[key].tolist(),
+                    "edges": self.edges(key).tolist(),
+                }
+            elif key in self._growing and self._growing[key].counts().size:
+                data[key]["hist"] = {
+                    "counts": self._growing[key].counts().tolist(),
+                    "edges": self._growing[key].edges().tolist(),
+                }
+        return data
+
+
+# checksum: blake2b of the output files, which reads them again end to end
+def save_stats(path, tstep, outputs, stats, checksum=False):
+    path = Path(path)
+    data = {"tstep": int(tstep), "fields": stats.to_dict()}
+    if checksum:
+        data["checksum"] = {"algorithm": "blake2b", "files": file_checksums(outputs)}
+    tmppath = path.with_name(path.stem + ".tmp" + path.suffix)
+    with open(tmppath, "w") as f:
+        json.dump(data, f)
+    tmppath.replace(path)
+
+
+def load_stats(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+# time series of the frame sidecars
+class StatsSeries:
+    def __init__(self, frames):
+        self._frames = sorted(frames, key=lambda frame: frame["tstep"])
+
+    @property
+    def tstep(self):
+        return np.array([frame["tstep"] for frame in self._frames], dtype=int)
+
+    @property
+    def fields(self):
+        names = []
+        for frame in self._frames:
+            for name in frame["fields"]:
+                if name not in names:
+                    names.append(name)
+        return names
+
+    # min, max, mean, l2, count of a field, indexed by tstep
+    def __getitem__(self, name):
+        rows = {}
+        for frame in self._frames:
+            if name in frame["fields"]:
+                entry = frame["fields"][name]
+                rows[frame["tstep"]] = {
+                    key: entry[key] for key in ["min", "max", "mean", "l2", "count"]
+                }
+        if not rows:
+            raise KeyError(
+                f"Field {name} not found in the stats, available: {self.fields}"
+            )
+        return pd.DataFrame.from_dict(rows, orient="index").rename_axis("tstep")
+
+    # counts and edges of a frame, None if the conversion only kept the moments
+    def hist(self, name, tstep):
+        for frame in self._frames:
+            if frame["tstep"] == tstep:
+                hist = frame["fields"][name].get("hist")
+                if hist is None:
+                    return None
+                return np.array(hist["counts"]), np.array(hist["edges"])
+        raise KeyError(f"No stats for tstep {tstep}")
+
+    # color limits fixed across all frames, field: name or a field label, e.g. lb.Field.vector("VEL")
+    def clim(self, field):
+        name = field if isinstance(field, str) else field.fullname()
+        df = self[name]
+        return [float(df["min"].min()), float(df["max"].max())]
+
+    # frames converted with checksum=True only
+    def checksums(self):
+        return {
+            frame["tstep"]: frame["checksum"]["files"]
+            for frame in self._frames
+            if "checksum" in frame
+        }
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __repr__(self):
+        return f"StatsSeries({len(self._frames)} frames; fields: {self.fields})"
@@ -1,9 +1,13 @@
-import pyvista as pv
+from pyvicar._utilities import lazy_import
 import numpy as np
+from pathlib import Path
 from abc import abstractmethod
 from pyvicar.tools.miscellaneous import split_into_n
+from pyvicar.tools.vtk import crop_slices, find_layout
 import pyvicar.tools.log as log
 
+pv = lazy_import("pyvista")
+
 
 _is_test = False
 
@@ -101,19 +105,64 @@ class sample_option:
         cls._generator = _SampleMeshGenerator3DDomain(
             lx, ly, lz, nx, ny, nz, npx, npy, npz
         )
-        cls._sample = cls._generator.to_pyvista_multiblocks()
-        cls._sample_combined = cls._sample.combine()
+        cls._sample = None
+        cls._sample_combined = None
+        cls._sample_grid = None
+
+    # the sample mesh is built at the first transfer, not at import
+    @classmethod
+    def sample(cls):
+        if cls._sample is None:
+            cls._sample = cls._generator.to_pyvista_multiblocks()
+        return cls._sample
+
+    @classmethod
+    def sample_combined(cls):
+        if cls._sample_combined is None:
+            cls._sample_combined = cls.sample().combine()
+        return cls._sample_combined
+
+    # sample fields on the full rectilinear grid of a vtm layout, kept for the same grid
+    @classmethod
+    def sample_grid(cls, layout):
+        key = tuple(coords.tobytes() for coords in (layout.x, layout.y, layout.z))
+        if cls._sample_grid is None or cls._sample_grid[0] != key:
+            grid = layout.to_pyvista()
+            cls._generator.add_field([grid])
+            cls._sample_grid = (key, grid)
+        return cls._sample_grid[1]
 
 
 sample_option.use_3ddomain()
 
 
+# cells of a rectilinear sample in the cell index slices (i, j, k)
+def _crop_sample(mesh, crop):
+    shape = tuple(n - 1 for n in mesh.dimensions)
+    coords = (mesh.x, mesh.y, mesh.z)
+    cropped = pv.RectilinearGrid(
+        *(c[s.start : s.stop + 1] for c, s in zip(coords, crop))
+    )
+    for name in mesh.cell_data:
+        # a plain array, a pyvista one would be stored as the full vtk array it views
+        values = np.asarray(mesh.cell_data[name])
+        values = values.reshape(shape + values.shape[1:], order="F")[crop + (...,)]
+        cropped.cell_data[name] = values.reshape(
+            (cropped.n_cells,) + values.shape[3:], order="F"
+        )
+    return cropped
+
+
+# sample handles accept the reader options of the real ones and return the sample mesh,
+# on the layout grid of the real vtm and cropped to bounds where the real reader would
 class SampleVTM:
-    def __init__(self, path, tstep, seriesi):
+    # dumps: the VTMList keeping the layout of the real frames
+    def __init__(self, path, tstep, seriesi, dumps=None):
         log.log(f"VTM Debug: creating handle for {path}, step {tstep}, No. {seriesi}")
         self._path = path
         self._tstep = tstep
         self._seriesi = seriesi
+        self._dumps = dumps
 
     @property
     def path(self):
@@ -131,13 +180,26 @@ class SampleVTM:
         log.log(
             f"VTM Debug: transferring to pyvista mb {self._path}, step {self._tstep}, No. {self._seriesi}"
         )
-        return sample_option._sample
+        return sample_option.sample()
+
+    def _layout(self):
+        if self._dumps is not None:
+            return self._dumps.frame_layout(self)
+        return find_layout(Path(self._path).parent)
 
-    def to_pyvista(self):
+    def to_pyvista(self, fields=None, nthreads=1, bounds=None):
         log.log(
             f"VTM Debug: transferring to pyvista combined {self._path}, step {self._tstep}, No. {self._seriesi}"
         )
-        return sample_option._sample_combined
+        layout = self._layout()
+        if layout is not None:
+            grid = sample_option.sample_grid(layout)
+            return grid if bounds is None else _crop_sample(grid, layout.crop(bounds))
+        if bounds is not None:
+            raise ValueError(
+                f"Bounds need the blocks of {self._path} on a rectilinear partition"
+            )
+        return sample_option.sample_combined()
 
     def __repr__(self):
         return f"SampleVTM(tstep = {self._tstep})"
@@ -162,11 +224,12 @@ class SampleVTK:
     def seriesi(self):
         return self._seriesi
 
-    def to_pyvista(self):
+    # the combined sample has no grid to crop, bounds are ignored
+    def to_pyvista(self, fields=None, bounds=None):
         log.log(
             f"VTK Debug: transferring to pyvista combined {self._path}, step {self._tstep}, No. {self._seriesi}"
         )
-        return sample_option._sample_combined
+        return sample_option.sample_combined()
 
     def __repr__(self):
         return f"SampleVTK(tstep = {self._tstep})"
@@ -191,11 +254,14 @@ class SampleVTR:
     def seriesi(self):
         return self._seriesi
 
-    def to_pyvista(self):
+    def to_pyvista(self, fields=None, bounds=None):
         log.log(
             f"VTR Debug: transferring to pyvista {self._path}, step {self._tstep}, No. {self._seriesi}"
         )
-        return sample_option._sample_combined[0]
+        mesh = sample_option.sample()[0]
+        if bounds is None:
+            return mesh
+        return _crop_sample(mesh, crop_slices(mesh.x, mesh.y, mesh.z, bounds))
 
     def __repr__(self):
         return f"SampleVTR(tstep = {self._tstep})"
@@ -1,21 +1,32 @@
-import pyvista as pv
+from pyvicar._utilities import lazy_import
 import numpy as np
 import xml.etree.ElementTree as ET
 import shutil
 from pathlib import Path
+from dataclasses import dataclass
 import pyvicar.tools.mpi as mpi
-from pyvicar.tools.log import log
-
-
-def combine_vtr(vtm, ijs):
-    # reconstruct full grid first
-    xs = {}
-    ys = {}
-    for iblock, (ip, jp) in enumerate(ijs):
-        block = vtm[iblock]
-        xs[ip] = block.x
-        ys[jp] = block.y
-
+from pyvicar.tools.log import log, log_host
+from pyvicar.tools.manifest import Manifest
+from pyvicar.tools.miscellaneous import threaded_imap
+from pyvicar.tools.vtkxml import RawVTRWriter, write_raw_vtr
+from pyvicar.tools.lod import LODPyramid
+from pyvicar.tools.precision import (
+    PrecisionErrors,
+    field_precision,
+    precision_options,
+    reduce_precision,
+    stored_dtype,
+)
+from pyvicar.tools.stats import FrameStats, save_stats, stats_path
+
+pv = lazy_import("pyvista")
+vtkIOXML = lazy_import("vtkmodules.vtkIOXML")
+
+
+# stitch the x/y coordinates of a xy-partitioned domain, blocks share the interface nodes
+# xs: {ip: x}, ys: {jp: y}
+# returns the full x, y and the starting cell index of each ip, jp
+def stitch_coords(xs, ys):
     xs = [xs[key] for key in sorted(xs)]
     ys = [ys[key] for key in sorted(ys)]
 
@@ -31,17 +42,266 @@ def combine_vtr(vtm, ijs):
 
     x = np.concatenate(xs, axis=0)
     y = np.concatenate(ys, axis=0)
-    z = vtm[0].z
 
-    nx = x.shape[0]
-    ny = y.shape[0]
-    nz = z.shape[0]
+    return x, y, ic0, jc0
+
+
+def block_field(block, name):
+    bnx, bny, bnz = block.dimensions
+    values = block.cell_data[name]
+    bshape = (bnx - 1, bny - 1, bnz - 1) + values.shape[1:]
+    return values.reshape(bshape, order="F")
+
+
+# block placement of a xy-partitioned vtm, the partition does not change during a run
+# so it is computed once from the first frame and reused by all readers
+@dataclass
+class VTMLayout:
+    ijs: list  # (ip, jp) of each block in the vtm order
+    x: np.ndarray
+    y: np.ndarray
+    z: np.ndarray
+    ic0: list  # starting cell index of each ip
+    jc0: list  # starting cell index of each jp
+    bshapes: list  # cell shape of each block
+
+    @property
+    def nblock(self):
+        return len(self.ijs)
+
+    @property
+    def shape(self):
+        return (self.x.shape[0] - 1, self.y.shape[0] - 1, self.z.shape[0] - 1)
+
+    def block_slices(self, iblock):
+        ip, jp = self.ijs[iblock]
+        bnxc, bnyc, _ = self.bshapes[iblock]
+        return (
+            slice(self.ic0[ip], self.ic0[ip] + bnxc),
+            slice(self.jc0[jp], self.jc0[jp] + bnyc),
+        )
+
+    # overlap of a block with cell index slices (i, j, k) of the full grid
+    # returns the block-local slices and the slices relative to the crop, None if they do not overlap
+    def block_overlap(self, iblock, crop):
+        bslices = self.block_slices(iblock) + (slice(0, self.bshapes[iblock][2]),)
+        local = []
+        dest = []
+        for b, c in zip(bslices, crop):
+            start = max(b.start, c.start)
+            stop = min(b.stop, c.stop)
+            if stop <= start:
+                return None
+            local.append(slice(start - b.start, stop - b.start))
+            dest.append(slice(start - c.start, stop - c.start))
+        return tuple(local), tuple(dest)
+
+    # expected: cell shape of the block read, the full block if not specified
+    def check_block(self, iblock, block, expected=None):
+        if expected is None:
+            expected = self.bshapes[iblock]
+        bshape = tuple(n - 1 for n in block.dimensions)
+        if bshape != tuple(expected):
+            raise ValueError(
+                f"Block {iblock} has cell shape {bshape}, but the layout expects {tuple(expected)}"
+            )
+
+    # crop: cell index slices (i, j, k), None for the full grid
+    def to_pyvista(self, crop=None):
+        if crop is None:
+            return pv.RectilinearGrid(self.x, self.y, self.z)
+        return pv.RectilinearGrid(
+            *(
+                coords[s.start : s.stop + 1]
+                for coords, s in zip((self.x, self.y, self.z), crop)
+            )
+        )
+
+    # cell index slices (i, j, k) of the cells overlapping bounds [x1, x2, y1, y2, z1, z2]
+    def crop(self, bounds):
+        return crop_slices(self.x, self.y, self.z, bounds)
+
+    # blocks: iterable of block geometries in the vtm order
+    # ijs: (ip, jp) of each block, None to detect from the block coordinates
+    @staticmethod
+    def from_blocks(blocks, ijs=None):
+        blocks = list(blocks)
+        if ijs is None:
+            ijs = detect_ijs([(block.x[0], block.y[0]) for block in blocks])
+        if len(blocks) != len(ijs):
+            raise ValueError(
+                f"Number of blocks {len(blocks)} does not match the partition of {len(ijs)} blocks"
+            )
+
+        xs = {}
+        ys = {}
+        z = None
+        bshapes = []
+        for block, (ip, jp) in zip(blocks, ijs):
+            # a wrong partition would otherwise silently scramble the stitched fields
+            for axis, coords, key, coord in [
+                ("x", xs, ip, block.x),
+                ("y", ys, jp, block.y),
+            ]:
+                if key in coords and not np.array_equal(coords[key], coord):
+                    raise ValueError(
+                        f"Blocks at the same {axis} partition {key} have different {axis} coordinates, the (ip, jp) partition does not match the vtm"
+                    )
+                coords[key] = coord
+            if z is None:
+                z = block.z
+            bshapes.append(tuple(n - 1 for n in block.dimensions))
+
+        for axis, coords in [("x", xs), ("y", ys)]:
+            keys = sorted(coords)
+            if keys != list(range(len(keys))):
+                raise ValueError(
+                    f"Partition indices along {axis} are not contiguous from 0: {keys}"
+                )
+            for k0, k1 in zip(keys[:-1], keys[1:]):
+                if coords[k0][-1] != coords[k1][0]:
+                    raise ValueError(
+                        f"Blocks at {axis} partitions {k0} and {k1} do not share an interface, the (ip, jp) partition does not match the vtm"
+                    )
+
+        x, y, ic0, jc0 = stitch_coords(xs, ys)
+        return VTMLayout(list(ijs), x, y, z, ic0, jc0, bshapes)
+
+    # geometry only, no field array is decoded
+    # ijs: (ip, jp) of each block, None to detect from the sub vtr extents or coordinates
+    @staticmethod
+    def from_vtm(vtm, ijs=None):
+        subpaths = extract_subvtr_paths(vtm)
+        if ijs is None:
+            ijs = detect_ijs_from_extents(subpaths)
+        # still None with local extents, then detected from the coordinates
+        return VTMLayout.from_blocks((read_vtr_geometry(p) for p in subpaths), ijs)
+
+    def save(self, path):
+        path = Path(path)
+        tmppath = path.with_name(path.stem + ".tmp" + path.suffix)
+        with open(tmppath, "wb") as f:
+            np.savez(
+                f,
+                ijs=np.array(self.ijs, dtype=int).reshape(-1, 2),
+                x=self.x,
+                y=self.y,
+                z=self.z,
+                ic0=np.array(self.ic0, dtype=int),
+                jc0=np.array(self.jc0, dtype=int),
+                bshapes=np.array(self.bshapes, dtype=int).reshape(-1, 3),
+            )
+        tmppath.replace(path)
+
+    @staticmethod
+    def load(path):
+        path = Path(path)
+        key = (str(path.resolve()), path.stat().st_mtime_ns)
+        if key not in _layout_cache:
+            with np.load(path) as data:
+                _layout_cache[key] = VTMLayout(
+                    [tuple(int(i) for i in ij) for ij in data["ijs"]],
+                    data["x"],
+                    data["y"],
+                    data["z"],
+                    [int(i) for i in data["ic0"]],
+                    [int(i) for i in data["jc0"]],
+                    [tuple(int(i) for i in s) for s in data["bshapes"]],
+                )
+        return _layout_cache[key]
+
+
+_layout_cache = {}
+
+
+# starts: (x start, y start) of each block, either global index extents or coordinates
+# the rank of a start among the distinct starts is the partition index
+# returns None if the starts cannot tell the blocks apart, e.g. local extents all from 0
+def _rank_starts(starts):
+    xstarts = sorted(set(start[0] for start in starts))
+    ystarts = sorted(set(start[1] for start in starts))
+    ijs = [(xstarts.index(x0), ystarts.index(y0)) for x0, y0 in starts]
+
+    if len(set(ijs)) != len(ijs) or len(ijs) != len(xstarts) * len(ystarts):
+        return None
+
+    return ijs
+
+
+# (ip, jp) of each block in the vtm order
+# starts: global index extent starts from the headers, or the first coordinates x[0], y[0]
+def detect_ijs(starts):
+    ijs = _rank_starts(starts)
+    if ijs is None:
+        raise ValueError(
+            f"Cannot detect a xy partition from the block starts {starts}, specify the partition explicitly"
+        )
+    return ijs
+
+
+# header only, the parse stops before any data array
+def read_vtr_extent(path):
+    with open(path, "rb") as f:
+        for _, elem in ET.iterparse(f, events=("start",)):
+            if elem.tag == "Piece":
+                return [int(n) for n in elem.attrib["Extent"].split()]
+
+    raise ValueError(f"No Piece extent found in {path}")
+
+
+# partition from the sub vtr headers only, which works if the extents are global index ranges,
+# returns None for local extents so that the block coordinates are needed
+def detect_ijs_from_extents(subpaths):
+    return _rank_starts([tuple(read_vtr_extent(p)[0:4:2]) for p in subpaths])
+
 
-    nxc = nx - 1
-    nyc = ny - 1
-    nzc = nz - 1
+# the layout index is stored in the fields folder of a case, next to the dumped frames
+def layout_path(fields_path):
+    return Path(fields_path) / "fields.layout.npz"
 
-    full = pv.RectilinearGrid(x, y, z)
+
+def find_layout(fields_path):
+    path = layout_path(fields_path)
+    if not path.exists():
+        return None
+    return VTMLayout.load(path)
+
+
+# cell index range [i0, i1) of the cells overlapping [lo, hi] along one axis
+def crop_range(coords, lo, hi):
+    ncell = coords.shape[0] - 1
+    i0 = int(np.clip(np.searchsorted(coords, lo, side="right") - 1, 0, ncell))
+    i1 = int(np.clip(np.searchsorted(coords, hi, side="left"), 0, ncell))
+    return i0, i1
+
+
+# bounds: [x1, x2, y1, y2, z1, z2]
+# returns the cell index slices (i, j, k) of the cells overlapping the box
+def crop_slices(x, y, z, bounds):
+    if len(bounds) != 6:
+        raise ValueError(
+            f"Expected bounds [x1, x2, y1, y2, z1, z2], but encountered {bounds}"
+        )
+
+    crop = []
+    for axis, coords, lo, hi in zip("xyz", (x, y, z), bounds[0::2], bounds[1::2]):
+        coords = np.asarray(coords)
+        i0, i1 = crop_range(coords, lo, hi)
+        if i1 <= i0:
+            raise ValueError(
+                f"Bounds [{lo}, {hi}] do not overlap the grid along {axis}, which spans [{coords[0]}, {coords[-1]}]"
+            )
+        crop.append(slice(i0, i1))
+    return tuple(crop)
+
+
+# vtm: pyvista multiblock, layout: VTMLayout or the (ip, jp) list of the blocks
+def combine_vtr(vtm, layout):
+    if not isinstance(layout, VTMLayout):
+        layout = VTMLayout.from_blocks(vtm, layout)
+
+    full = layout.to_pyvista()
+    nxc, nyc, nzc = layout.shape
 
     # combine fields
     sample_block = vtm[0]
@@ -49,16 +309,10 @@ def combine_vtr(vtm, ijs):
         tensor_shape = sample_block.cell_data[name].shape[1:]
         fullshape = (nxc, nyc, nzc) + tensor_shape
         field = np.zeros(fullshape, dtype=sample_block.cell_data[name].dtype)
-        for iblock, (ip, jp) in enumerate(ijs):
+        for iblock in range(layout.nblock):
             block = vtm[iblock]
-            bnx, bny, bnz = block.dimensions
-            bnxc, bnyc, bnzc = bnx - 1, bny - 1, bnz - 1
-            bshape = (bnxc, bnyc, bnzc) + tensor_shape
-            field[
-                ic0[ip] : ic0[ip] + bnxc,
-                jc0[jp] : jc0[jp] + bnyc,
-                ...,
-            ] = block.cell_data[name].reshape(bshape, order="F")
+            layout.check_block(iblock, block)
+            field[layout.block_slices(iblock) + (...,)] = block_field(block, name)
 
         ravel_shape = (nxc * nyc * nzc,) + tensor_shape
         full.cell_data[name] = field.reshape(ravel_shape, order="F")
@@ -66,6 +320,236 @@ def combine_vtr(vtm, ijs):
     return full
 
 
+def _select_arrays(reader, path, fields):
+    reader.disable_all_cell_arrays()
+    reader.disable_all_point_arrays()
+    for name in fields:
+        if name in reader.cell_array_names:
+            reader.enable_cell_array(name)
+        elif name in reader.point_array_names:
+            reader.enable_point_array(name)
+        else:
+            raise KeyError(
+                f"Field {name} not found in {path}, available: {reader.cell_array_names + reader.point_array_names}"
+            )
+
+
+# fields: names of the arrays to decode, None for all
+# arrays not requested are switched off in the xml readers and never decoded,
+# the legacy vtk reader has no array selection so they are dropped after reading
+def read_vtk(path, fields=None):
+    if fields is None:
+        return pv.read(path)
+
+    reader = pv.get_reader(path)
+    if not hasattr(reader, "enable_cell_array"):
+        mesh = reader.read()
+        for name in list(mesh.cell_data.keys()):
+            if name not in fields:
+                del mesh.cell_data[name]
+        for name in list(mesh.point_data.keys()):
+            if name not in fields:
+                del mesh.point_data[name]
+        return mesh
+
+    _select_arrays(reader, path, fields)
+    return reader.read()
+
+
+# crop: cell index slices (i, j, k) local to the file
+# the xml reader is asked for the sub extent only, so just the hyperslab of each array is read
+def read_vtr_crop(path, crop, fields=None):
+    reader = pv.get_reader(path)
+    if fields is not None:
+        _select_arrays(reader, path, fields)
+
+    x0, _, y0, _, z0, _ = read_vtr_extent(path)
+    extent = []
+    for start, s in zip((x0, y0, z0), crop):
+        # cells [i0, i1) span the nodes [i0, i1]
+        extent += [start + s.start, start + s.stop]
+
+    reader.reader.UpdateInformation()
+    reader.reader.UpdateExtent(extent)
+    return pv.wrap(reader.reader.GetOutput())
+
+
+# bounds: [x1, x2, y1, y2, z1, z2], None for the full grid
+def read_vtr(path, fields=None, bounds=None):
+    if bounds is None:
+        return read_vtk(path, fields)
+
+    geometry = read_vtr_geometry(path)
+    crop = crop_slices(geometry.x, geometry.y, geometry.z, bounds)
+    return read_vtr_crop(path, crop, fields)
+
+
+# only the coordinates of a sub vtr, no field array is decoded
+def read_vtr_geometry(path):
+    reader = pv.get_reader(path)
+    reader.disable_all_cell_arrays()
+    reader.disable_all_point_arrays()
+    return reader.read()
+
+
+# sub vtrs of a vtm file placed by the cached layout, yielded one block at a time in the vtm order
+# nthreads > 1 reads and decodes the next blocks concurrently, the vtk readers release the gil
+# crop: cell index slices (i, j, k) of the full grid, only the overlapping blocks are opened
+# and only their overlapping part is read, yielded with the slices relative to the crop
+def iter_subvtrs(vtmpath, layout, nthreads=1, fields=None, crop=None):
+    subpaths = subvtr_paths(vtmpath)
+    if len(subpaths) != layout.nblock:
+        raise ValueError(
+            f"Number of blocks {len(subpaths)} in {vtmpath} does not match the layout of {layout.nblock} blocks"
+        )
+
+    if crop is None:
+        read = lambda path: read_vtk(path, fields)
+        for iblock, block in enumerate(threaded_imap(read, subpaths, nthreads)):
+            layout.check_block(iblock, block)
+            yield iblock, block, layout.block_slices(iblock)
+        return
+
+    overlaps = {}
+    for iblock in range(layout.nblock):
+        overlap = layout.block_overlap(iblock, crop)
+        if overlap is not None:
+            overlaps[iblock] = overlap
+
+    read = lambda iblock: read_vtr_crop(subpaths[iblock], overlaps[iblock][0], fields)
+    for iblock, block in zip(overlaps, threaded_imap(read, overlaps, nthreads)):
+        local, dest = overlaps[iblock]
+        layout.check_block(iblock, block, tuple(s.stop - s.start for s in local))
+        yield iblock, block, dest
+
+
+# full rectilinear grid of a vtm file, without reading the multiblock as a whole
+# bounds: [x1, x2, y1, y2, z1, z2] to read the cropped grid of the cells overlapping the box
+def read_vtm_as_vtr(vtmpath, layout, nthreads=1, fields=None, bounds=None):
+    crop = None if bounds is None else layout.crop(bounds)
+    full = layout.to_pyvista(crop)
+    shape = tuple(n - 1 for n in full.dimensions)
+
+    arrays = {}
+    for _, block, dest in iter_subvtrs(vtmpath, layout, nthreads, fields, crop):
+        for name in block.cell_data:
+            values = block_field(block, name)
+            if name not in arrays:
+                arrays[name] = np.zeros(shape + values.shape[3:], dtype=values.dtype)
+            arrays[name][dest + (...,)] = values
+        del block
+
+    ncell = full.n_cells
+    for name, field in arrays.items():
+        full.cell_data[name] = field.reshape((ncell,) + field.shape[3:], order="F")
+
+    return full
+
+
+# merged unstructured grid of a vtm file stitched by the layout index, the duplicated interface
+# nodes are dropped by index instead of a tolerance merge, so points and cells come out
+# in the same x-fastest order for every frame
+def stitch_vtk(vtmpath, layout, nthreads=1, fields=None):
+    return read_vtm_as_vtr(
+        vtmpath, layout, nthreads, fields
+    ).cast_to_unstructured_grid()
+
+
+# same output as combine_vtr, but the sub vtrs are read one at a time and written
+# into a preallocated raw vtr on disk, so the memory is bounded by one block
+# pyramid: LODPyramid fed with each block while it is in memory
+# precision, errors: lossy storage policy and the PrecisionErrors to record into, see reduce_vtr_precision
+# stats: FrameStats of the stored values, histograms included, in the same pass as the writing
+def stream_combine_vtr(
+    vtm,
+    layout,
+    newpath,
+    nthreads=1,
+    pyramid=None,
+    precision=None,
+    errors=None,
+    stats=None,
+):
+    writer = None
+    for _, block, dest in iter_subvtrs(vtm.path, layout, nthreads):
+        if writer is None:
+            cell_arrays = {
+                name: (
+                    stored_dtype(
+                        block.cell_data[name].dtype, field_precision(precision, name)
+                    ),
+                    block.cell_data[name].shape[1:],
+                )
+                for name in block.cell_data
+            }
+            tmppath = newpath.with_name(newpath.stem + ".tmp" + newpath.suffix)
+            writer = RawVTRWriter(tmppath, layout.x, layout.y, layout.z, cell_arrays)
+
+        for name in cell_arrays:
+            values = block_field(block, name)
+            reduced = reduce_precision(values, field_precision(precision, name))
+            if errors is not None:
+                errors.add(name, values, reduced)
+            writer.field(name)[dest + (...,)] = reduced
+            if pyramid is not None:
+                pyramid.add(name, values, dest + (slice(0, layout.shape[2]),))
+            if stats is not None:
+                stats.add(name, reduced.reshape((-1,) + reduced.shape[3:]), hist=True)
+        del block
+
+    if writer is None:
+        raise ValueError(
+            f"No sub vtr blocks in {vtm.path}, cannot combine an empty vtm"
+        )
+    writer.close()
+    tmppath.replace(newpath)
+
+
+# lossy storage of the cell fields in place, see Precision
+def reduce_vtr_precision(mesh, precision, errors=None):
+    for name in list(mesh.cell_data.keys()):
+        values = mesh.cell_data[name]
+        reduced = reduce_precision(values, field_precision(precision, name))
+        if errors is not None:
+            errors.add(name, values, reduced)
+        if reduced is not values:
+            mesh.cell_data[name] = reduced
+    return mesh
+
+
+_compressors = {
+    "zlib": "SetCompressorTypeToZLib",
+    "lz4": "SetCompressorTypeToLZ4",
+    "lzma": "SetCompressorTypeToLZMA",
+}
+
+
+# binary xml vtr, compressor: "zlib", "lz4", "lzma" or None, level: 1-9, None for the vtk default
+def save_vtr(mesh, path, compressor="zlib", level=None):
+    writer = vtkIOXML.vtkXMLRectilinearGridWriter()
+    writer.SetFileName(str(path))
+    writer.SetInputData(mesh)
+    writer.SetDataModeToBinary()
+    writer.SetHeaderTypeToUInt64()
+    if compressor is None:
+        writer.SetCompressorTypeToNone()
+    elif compressor in _compressors:
+        getattr(writer, _compressors[compressor])()
+    else:
+        raise ValueError(
+            f"Unknown compressor {compressor}, expected one of {list(_compressors)} or None"
+        )
+    if level is not None:
+        writer.SetCompressionLevel(level)
+    if writer.Write() != 1:
+        raise RuntimeError(f"Failed to write {path}")
+
+
+# per-frame sidecar fields.N.stats.json, see FrameStats
+def write_frame_stats(vtm, outputs, stats, checksum=False):
+    save_stats(stats_path(vtm.path), vtm.tstep, outputs, stats, checksum)
+
+
 def create_ijs_from_forxy(npx, npy):
     list1 = []
     for ip in range(npx):
@@ -83,44 +567,238 @@ def remove_vtm(vtmpath, basename):
         shutil.rmtree(vtrfolder)
 
 
-def compress_to_vtk(vtms, keep_vtms=True):
+def manifest_path(fields_path):
+    return Path(fields_path) / "fields.manifest.json"
+
+
+# frames still to be converted, the finished ones in the manifest are skipped
+# returns the pending vtms and the loaded manifest, None if resume is off
+def pending_vtms(vtms, kind, options, output_f, resume=True, on_crashed=None):
+    vtms = list(vtms)
+    if not resume or not vtms:
+        return vtms, None
+
+    manifest = Manifest(manifest_path(vtms[0].path.parent), kind, options)
+    manifest.load(on_crashed)
+    todo = [vtm for vtm in vtms if not manifest.is_done(vtm.path, output_f(vtm))]
+    if len(todo) != len(vtms):
+        log_host(
+            f"Compress {kind}: {len(vtms) - len(todo)} of {len(vtms)} frames already converted, skipped"
+        )
+
+    return todo, manifest
+
+
+def vtk_output(vtm):
+    return vtm.path.parent / Path(f"{vtm.path.stem}.vtk")
+
+
+def vtr_output(vtm):
+    return vtm.path.parent / Path(f"{vtm.path.stem}.vtr")
+
+
+def lod_output(vtm, level):
+    return vtm.path.parent / Path(f"{vtm.path.stem}.lod{level}.vtr")
+
+
+def binary_output(vtm):
+    return vtm.path.parent / Path(f"{vtm.path.stem}")
+
+
+def remove_vtr_temporaries(vtmpath):
+    tmppath = vtmpath.parent / Path(f"{vtmpath.stem}.tmp.vtr")
+    if tmppath.exists():
+        log(f"Compress VTR: Removing temporary {tmppath} left by a previous run")
+        tmppath.unlink()
+
+
+def remove_binary_temporaries(vtmpath):
+    for subpath in subvtr_paths(vtmpath):
+        tmppath = subpath.with_name(subpath.stem + ".bin" + subpath.suffix)
+        if tmppath.exists():
+            log(f"Compress binary: Removing temporary {tmppath} left by a previous run")
+            tmppath.unlink()
+
+
+# structured=True stitches the blocks by the layout, see stitch_vtk,
+# False merges the points by a tolerance search, as for blocks not on a xy partition
+# layout: VTMLayout, or the (ip, jp) list of the blocks, None to detect from the first vtm,
+# falling back to the merge if no layout is detected
+# nthreads: sub vtrs read concurrently within each frame when structured
+# stats: write the field statistics sidecar fields.N.stats.json with a histogram of bins
+# checksum: also record a blake2b checksum of the output in the sidecar, reading it again
+# resume: skip the frames recorded as converted in FieldsFiles/fields.manifest.json
+def compress_to_vtk(
+    vtms,
+    keep_vtms=True,
+    *,
+    layout=None,
+    structured=True,
+    nthreads=1,
+    resume=True,
+    stats=True,
+    bins=64,
+    checksum=False,
+):
+    vtms = list(vtms)
+    if structured and vtms and not isinstance(layout, VTMLayout):
+        if layout is not None:
+            layout = VTMLayout.from_vtm(vtms[0], layout)
+        else:
+            try:
+                layout = VTMLayout.from_vtm(vtms[0])
+            except ValueError:
+                log_host(
+                    f"Compress VTK: No xy block layout detected in {vtms[0].path.name}, merging the blocks by points instead"
+                )
+                structured = False
+
+    vtms, manifest = pending_vtms(
+        vtms, "VTK", {"structured": structured}, vtk_output, resume
+    )
+    if not vtms:
+        return
+
     for vtm in mpi.dispatch(vtms):
         log(f"Compress VTK: Compressing {vtm.path}")
         basename = vtm.path.stem
-        mesh = pv.read(vtm.path)
-
-        # vtk unstruc combine
-        npoints_sum = sum(block.n_points for block in mesh)
-        mesh = mesh.combine()
-        mesh = mesh.clean(tolerance=1e-6)
-        npoints_merged = mesh.n_points
-        log(
-            f"Stat of npoints: sum of mb = {npoints_sum}, merged vtk = {npoints_merged}",
-        )
-        newpath = vtm.path.parent / Path(f"{basename}.vtk")
+        newpath = vtk_output(vtm)
+        if manifest is not None:
+            manifest.start(vtm.path, newpath)
+
+        if structured:
+            mesh = stitch_vtk(vtm.path, layout, nthreads)
+        else:
+            mesh = pv.read(vtm.path)
+
+            # vtk unstruc combine
+            npoints_sum = sum(block.n_points for block in mesh)
+            mesh = mesh.combine()
+            mesh = mesh.clean(tolerance=1e-6)
+            npoints_merged = mesh.n_points
+            log(
+                f"Stat of npoints: sum of mb = {npoints_sum}, merged vtk = {npoints_merged}",
+            )
         mesh.save(newpath, binary=True)
 
+        if stats:
+            frame_stats = FrameStats(bins)
+            frame_stats.add_mesh(mesh)
+            write_frame_stats(vtm, [newpath], frame_stats, checksum)
+        del mesh
+
+        if manifest is not None:
+            manifest.done(vtm.path, newpath)
+
         if not keep_vtms:
             remove_vtm(vtm.path, basename)
 
+    if manifest is not None:
+        manifest.close()
+
+
+# layout: VTMLayout, or the (ip, jp) list of the blocks to build one from the first vtm,
+# None to detect the partition from the first vtm
+# streaming=True reads one sub vtr at a time and writes an uncompressed raw vtr,
+# trading disk size for a peak memory of one block instead of 2-3x the frame
+# nthreads: sub vtrs read concurrently within each frame, in addition to the mpi split over frames,
+# with streaming the memory becomes nthreads blocks
+# lods: levels of coarse copies written next to each frame as fields.N.lod{level}.vtr, e.g. (2, 4, 8),
+# level^3 cells are volume averaged into one, in the same pass as the stitching
+# precision: Precision for all float fields or {name: Precision}, None for lossless,
+# the max/rms error introduced is logged per field and frame
+# compressor, level: see save_vtr, not used by the uncompressed streaming output
+# stats: write the field statistics sidecar fields.N.stats.json with a histogram of bins,
+# checksum: also record a blake2b checksum of the output in the sidecar, reading it again
+# resume: skip the frames recorded as converted in FieldsFiles/fields.manifest.json
+def compress_to_vtr(
+    vtms,
+    layout=None,
+    keep_vtms=True,
+    streaming=False,
+    nthreads=1,
+    resume=True,
+    lods=(),
+    precision=None,
+    compressor="zlib",
+    level=None,
+    stats=True,
+    bins=64,
+    checksum=False,
+):
+    vtms, manifest = pending_vtms(
+        vtms,
+        "VTR",
+        {
+            "streaming": streaming,
+            "lods": list(lods),
+            "precision": precision_options(precision),
+            "compressor": compressor,
+            "level": level,
+        },
+        vtr_output,
+        resume,
+        remove_vtr_temporaries,
+    )
+    if not vtms:
+        return
+
+    if not isinstance(layout, VTMLayout):
+        layout = VTMLayout.from_vtm(vtms[0], layout)
 
-def compress_to_vtr(vtms, ijs, keep_vtms=True):
     for vtm in mpi.dispatch(vtms):
         log(f"Compress VTR: Compressing {vtm.path}")
         basename = vtm.path.stem
-        mesh = pv.read(vtm.path)
-
-        # vtr reconstruction
-        mesh = combine_vtr(mesh, ijs)
-        newpath = vtm.path.parent / Path(f"{basename}.vtr")
-        mesh.save(newpath, binary=True)
+        newpath = vtr_output(vtm)
+        if manifest is not None:
+            manifest.start(vtm.path, newpath)
+
+        pyramid = LODPyramid(layout.x, layout.y, layout.z, lods) if lods else None
+        errors = PrecisionErrors()
+        frame_stats = FrameStats(bins) if stats else None
+        if streaming:
+            stream_combine_vtr(
+                vtm,
+                layout,
+                newpath,
+                nthreads,
+                pyramid,
+                precision,
+                errors,
+                frame_stats,
+            )
+        else:
+            # vtr reconstruction
+            mesh = read_vtm_as_vtr(vtm.path, layout, nthreads)
+            if pyramid is not None:
+                pyramid.add_mesh(mesh)
+            reduce_vtr_precision(mesh, precision, errors)
+            save_vtr(mesh, newpath, compressor, level)
+            if frame_stats is not None:
+                frame_stats.add_mesh(mesh)
+            del mesh
+        errors.log(f"Compress VTR: {vtm.path.name}")
+        if frame_stats is not None:
+            write_frame_stats(vtm, [newpath], frame_stats, checksum)
+
+        if pyramid is not None:
+            for lod in pyramid.levels:
+                lod_mesh = reduce_vtr_precision(pyramid.to_pyvista(lod), precision)
+                save_vtr(lod_mesh, lod_output(vtm, lod), compressor, level)
+
+        if manifest is not None:
+            manifest.done(vtm.path, newpath)
 
         if not keep_vtms:
             remove_vtm(vtm.path, basename)
 
+    if manifest is not None:
+        manifest.close()
 
-def extract_subvtr_paths(vtm):
-    tree = ET.parse(vtm.path)
+
+def subvtr_paths(vtmpath):
+    vtmpath = Path(vtmpath)
+    tree = ET.parse(vtmpath)
     root = tree.getroot()
 
     vtr_paths = []
@@ -128,33 +806,106 @@ def extract_subvtr_paths(vtm):
     for ds in root.iter("DataSet"):
         if "file" in ds.attrib:
             rel_path = ds.attrib["file"]
-            full_path = (vtm.path.parent / rel_path).resolve()
+            full_path = (vtmpath.parent / rel_path).resolve()
             vtr_paths.append(full_path)
 
     return vtr_paths
 
 
-def vtr_to_binary(vtr_path, inplace=True):
+def extract_subvtr_paths(vtm):
+    return subvtr_paths(vtm.path)
+
+
+# raw=True writes uncompressed appended raw data, which is larger
+# but can be memory mapped by memmap_vtr without a vtk parse
+# precision, compressor, level: see compress_to_vtr
+# returns the PrecisionErrors introduced and the stored cell arrays {name: values}
+def vtr_to_binary(
+    vtr_path, inplace=True, raw=False, precision=None, compressor="zlib", level=None
+):
     path = Path(vtr_path)
     mesh = pv.read(path)
+    errors = PrecisionErrors()
+    reduce_vtr_precision(mesh, precision, errors)
+    arrays = {name: np.asarray(mesh.cell_data[name]) for name in mesh.cell_data}
 
     tmp_path = path.with_name(path.stem + ".bin" + path.suffix)
     if tmp_path.exists():
         tmp_path.unlink()
 
-    mesh.save(tmp_path, binary=True)
+    if raw:
+        write_raw_vtr(mesh, tmp_path)
+    else:
+        save_vtr(mesh, tmp_path, compressor, level)
     if inplace:
         tmp_path.replace(path)
 
+    return errors, arrays
+
+
+# nthreads: sub vtrs converted concurrently within each frame
+# precision, compressor, level: see compress_to_vtr
+# stats: write the field statistics sidecar fields.N.stats.json with a histogram of bins,
+# fed in the sub vtr order as the conversions finish
+# checksum: also record a blake2b checksum of the outputs in the sidecar, reading them again
+# resume: skip the frames recorded as converted in FieldsFiles/fields.manifest.json
+def compress_to_binary(
+    vtms,
+    inplace=True,
+    nthreads=1,
+    resume=True,
+    raw=False,
+    precision=None,
+    compressor="zlib",
+    level=None,
+    stats=True,
+    bins=64,
+    checksum=False,
+):
+    vtms, manifest = pending_vtms(
+        vtms,
+        "binary",
+        {
+            "inplace": inplace,
+            "raw": raw,
+            "precision": precision_options(precision),
+            "compressor": compressor,
+            "level": level,
+        },
+        binary_output,
+        resume,
+        remove_binary_temporaries,
+    )
 
-def compress_to_binary(vtms, inplace=True):
     for vtm in mpi.dispatch(vtms):
         log(f"Compress binary: Compressing {vtm.path}")
+        if manifest is not None:
+            manifest.start(vtm.path, binary_output(vtm))
 
         vtr_files = extract_subvtr_paths(vtm)
 
-        for f in vtr_files:
-            vtr_to_binary(f, inplace=inplace)
+        convert = lambda f: vtr_to_binary(f, inplace, raw, precision, compressor, level)
+        errors = PrecisionErrors()
+        frame_stats = FrameStats(bins)
+        for file_errors, arrays in threaded_imap(convert, vtr_files, nthreads):
+            errors.merge(file_errors)
+            if stats:
+                for name, values in arrays.items():
+                    frame_stats.add(name, values, hist=True)
+            del arrays
+        errors.log(f"Compress binary: {vtm.path.name}")
+        if stats:
+            outputs = [
+                f if inplace else f.with_name(f.stem + ".bin" + f.suffix)
+                for f in vtr_files
+            ]
+            write_frame_stats(vtm, outputs, frame_stats, checksum)
+
+        if manifest is not None:
+            manifest.done(vtm.path, binary_output(vtm))
+
+    if manifest is not None:
+        manifest.close()
 
 
 def stroke(mesh, dz):
@@ -0,0 +1,348 @@
+import re
+import numpy as np
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from dataclasses import dataclass
+
+# vtk xml type names of the numpy dtypes that can be stored
+_vtk_types = {
+    np.dtype("int8"): "Int8",
+    np.dtype("uint8"): "UInt8",
+    np.dtype("int16"): "Int16",
+    np.dtype("uint16"): "UInt16",
+    np.dtype("int32"): "Int32",
+    np.dtype("uint32"): "UInt32",
+    np.dtype("int64"): "Int64",
+    np.dtype("uint64"): "UInt64",
+    np.dtype("float32"): "Float32",
+    np.dtype("float64"): "Float64",
+}
+
+
+_np_types = {v: k for k, v in _vtk_types.items()}
+
+
+def vtk_type(dtype):
+    dtype = np.dtype(dtype).newbyteorder("=")
+    if dtype not in _vtk_types:
+        raise TypeError(f"Data type {dtype} cannot be stored in a vtk xml file")
+    return _vtk_types[dtype]
+
+
+# a rectilinear grid file with uncompressed appended raw data,
+# the full file is preallocated on disk with all offsets known in advance,
+# so that cell fields can be filled block by block thru memmap views
+# without holding any full-size array in memory
+class RawVTRWriter:
+    _header_type = np.dtype("<u8")
+
+    # cell_arrays: {name: (dtype, tensor_shape)}
+    def __init__(self, path, x, y, z, cell_arrays):
+        self._path = Path(path)
+        self._x = np.asarray(x)
+        self._y = np.asarray(y)
+        self._z = np.asarray(z)
+        self._ncell = (
+            (self._x.shape[0] - 1) * (self._y.shape[0] - 1) * (self._z.shape[0] - 1)
+        )
+
+        # data blocks in the order they are appended
+        self._blocks = []
+        offset = 0
+        for name, (dtype, tensor_shape) in cell_arrays.items():
+            dtype = np.dtype(dtype).newbyteorder("<")
+            tensor_shape = tuple(tensor_shape)
+            ncomp = int(np.prod(tensor_shape, dtype=int))
+            nbytes = self._ncell * ncomp * dtype.itemsize
+            self._blocks.append(("cell", name, dtype, tensor_shape, offset, nbytes))
+            offset += self._header_type.itemsize + nbytes
+        for name, coord in zip("xyz", [self._x, self._y, self._z]):
+            dtype = coord.dtype.newbyteorder("<")
+            nbytes = coord.shape[0] * dtype.itemsize
+            self._blocks.append(("coord", name, dtype, (), offset, nbytes))
+            offset += self._header_type.itemsize + nbytes
+
+        head, tail = self._xml()
+        self._data_start = len(head)
+        self._data_size = offset
+
+        with open(self._path, "wb") as f:
+            f.write(head)
+            f.truncate(self._data_start + self._data_size)
+            f.seek(self._data_start + self._data_size)
+            f.write(tail)
+
+            for kind, name, dtype, _, offset, nbytes in self._blocks:
+                f.seek(self._data_start + offset)
+                f.write(np.array([nbytes], dtype=self._header_type).tobytes())
+                if kind == "coord":
+                    coord = getattr(self, f"_{name}")
+                    f.write(coord.astype(dtype, copy=False).tobytes())
+
+        self._views = {}
+
+    def _xml(self):
+        nx, ny, nz = self._x.shape[0], self._y.shape[0], self._z.shape[0]
+        extent = f"0 {nx - 1} 0 {ny - 1} 0 {nz - 1}"
+
+        cells = []
+        coords = []
+        for kind, name, dtype, tensor_shape, offset, _ in self._blocks:
+            if kind == "cell":
+                ncomp = int(np.prod(tensor_shape, dtype=int))
+                cells.append(
+                    f'        <DataArray type="{vtk_type(dtype)}" Name="{name}" NumberOfComponents="{ncomp}" format="appended" offset="{offset}"/>\n'
+                )
+            else:
+                coords.append(
+                    f'        <DataArray type="{vtk_type(dtype)}" Name="{name}" format="appended" offset="{offset}"/>\n'
+                )
+
+        head = (
+            '<?xml version="1.0"?>\n'
+            '<VTKFile type="RectilinearGrid" version="1.0" byte_order="LittleEndian" header_type="UInt64">\n'
+            f'  <RectilinearGrid WholeExtent="{extent}">\n'
+            f'    <Piece Extent="{extent}">\n'
+            "      <PointData>\n"
+            "      </PointData>\n"
+            "      <CellData>\n"
+            f"{''.join(cells)}"
+            "      </CellData>\n"
+            "      <Coordinates>\n"
+            f"{''.join(coords)}"
+            "      </Coordinates>\n"
+            "    </Piece>\n"
+            "  </RectilinearGrid>\n"
+            '  <AppendedData encoding="raw">\n'
+            "   _"
+        )
+        tail = "\n  </AppendedData>\n</VTKFile>\n"
+
+        return head.encode("ascii"), tail.encode("ascii")
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def shape(self):
+        return (self._x.shape[0] - 1, self._y.shape[0] - 1, self._z.shape[0] - 1)
+
+    # writable view indexed as [i, j, k, (comp)], same as the F-ordered reshape of a vtk cell array
+    def field(self, name):
+        if name in self._views:
+            return self._views[name]
+
+        for kind, bname, dtype, tensor_shape, offset, _ in self._blocks:
+            if kind == "cell" and bname == name:
+                break
+        else:
+            raise KeyError(f"Field {name} is not allocated in {self._path}")
+
+        nxc, nyc, nzc = self.shape
+        mm = np.memmap(
+            self._path,
+            dtype=dtype,
+            mode="r+",
+            offset=self._data_start + offset + self._header_type.itemsize,
+            shape=(nzc, nyc, nxc) + tensor_shape,
+        )
+        # vtk stores x fastest then y, z, with components interleaved per cell
+        view = mm.transpose((2, 1, 0) + tuple(range(3, mm.ndim)))
+        self._views[name] = view
+        return view
+
+    def flush(self):
+        for view in self._views.values():
+            view.base.flush()
+
+    def close(self):
+        self.flush()
+        self._views.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+@dataclass
+class RawArray:
+    dtype: np.dtype
+    ncomp: int
+    offset: int  # from the start of the file, after the size header of the block
+
+
+@dataclass
+class RawVTRHeader:
+    extent: list
+    cell_arrays: dict  # {name: RawArray}
+    coords: dict  # {"x"/"y"/"z": RawArray}
+
+    @property
+    def shape(self):
+        x0, x1, y0, y1, z0, z1 = self.extent
+        return (x1 - x0, y1 - y0, z1 - z0)
+
+
+# rectilinear grid with its cell fields as np.memmap views indexed [i, j, k, (comp)]
+@dataclass
+class RawVTR:
+    path: Path
+    x: np.ndarray
+    y: np.ndarray
+    z: np.ndarray
+    cell_data: dict
+
+    @property
+    def shape(self):
+        return (self.x.shape[0] - 1, self.y.shape[0] - 1, self.z.shape[0] - 1)
+
+
+def _find_appended_start(path, chunksize=1 << 16):
+    head = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunksize)
+            if not chunk:
+                raise ValueError(f"No appended data found in {path}")
+            head += chunk
+
+            # an inline array before any appended data means the file cannot be mapped
+            m = re.search(rb"<DataArray[^>]*>", head)
+            if m and b'format="appended"' not in m.group(0):
+                raise ValueError(
+                    f"Arrays in {path} are stored inline, only appended raw data can be memory mapped"
+                )
+
+            pos = head.find(b"<AppendedData")
+            if pos < 0:
+                continue
+            close = head.find(b">", pos)
+            underscore = head.find(b"_", close) if close >= 0 else -1
+            if underscore < 0:
+                continue
+
+            return head[:pos], head[pos : close + 1], underscore + 1
+
+
+# parses the xml header only, the data arrays are not touched
+def read_raw_vtr_header(path):
+    xml, appended, data_start = _find_appended_start(path)
+
+    if b'encoding="raw"' not in appended:
+        raise ValueError(
+            f"Appended data in {path} is base64 encoded, only raw encoding can be memory mapped"
+        )
+
+    root = ET.fromstring(xml + b"</VTKFile>")
+    if root.attrib.get("type") != "RectilinearGrid":
+        raise ValueError(
+            f"Expected a RectilinearGrid file, but encountered {root.attrib.get('type')} in {path}"
+        )
+    if "compressor" in root.attrib:
+        raise ValueError(
+            f"Data in {path} is compressed by {root.attrib['compressor']}, only uncompressed data can be memory mapped"
+        )
+
+    byteorder = (
+        "<" if root.attrib.get("byte_order", "LittleEndian") == "LittleEndian" else ">"
+    )
+    header_type = root.attrib.get("header_type", "UInt32")
+    header_size = _np_types[header_type].itemsize
+
+    def raw_array(elem):
+        if elem.attrib.get("format") != "appended":
+            raise ValueError(
+                f"Array {elem.attrib.get('Name')} in {path} is stored inline, only appended raw data can be memory mapped"
+            )
+        dtype = _np_types[elem.attrib["type"]].newbyteorder(byteorder)
+        return RawArray(
+            dtype,
+            int(elem.attrib.get("NumberOfComponents", 1)),
+            data_start + int(elem.attrib["offset"]) + header_size,
+        )
+
+    piece = root.find("RectilinearGrid/Piece")
+    extent = [int(n) for n in piece.attrib["Extent"].split()]
+
+    cell_arrays = {}
+    celldata = piece.find("CellData")
+    if celldata is not None:
+        for elem in celldata.iter("DataArray"):
+            cell_arrays[elem.attrib["Name"]] = raw_array(elem)
+
+    coords = {}
+    for axis, elem in zip("xyz", piece.find("Coordinates").iter("DataArray")):
+        coords[axis] = raw_array(elem)
+
+    return RawVTRHeader(extent, cell_arrays, coords)
+
+
+# zero-copy reader of an uncompressed appended raw vtr, only the pages touched are read
+# fields: names of the cell arrays to map, None for all
+def memmap_vtr(path, fields=None, mode="r"):
+    path = Path(path)
+    header = read_raw_vtr_header(path)
+    nxc, nyc, nzc = header.shape
+
+    coords = {}
+    for axis, n in zip("xyz", (nxc + 1, nyc + 1, nzc + 1)):
+        array = header.coords[axis]
+        coords[axis] = np.fromfile(
+            path, dtype=array.dtype, count=n, offset=array.offset
+        )
+
+    if fields is None:
+        fields = list(header.cell_arrays.keys())
+
+    cell_data = {}
+    for name in fields:
+        if name not in header.cell_arrays:
+            raise KeyError(
+                f"Field {name} not found in {path}, available: {list(header.cell_arrays.keys())}"
+            )
+        array = header.cell_arrays[name]
+        shape = (nzc, nyc, nxc) + ((array.ncomp,) if array.ncomp != 1 else ())
+        mm = np.memmap(
+            path, dtype=array.dtype, mode=mode, offset=array.offset, shape=shape
+        )
+        # vtk stores x fastest then y, z, with components interleaved per cell
+        cell_data[name] = mm.transpose((2, 1, 0) + tuple(range(3, mm.ndim)))
+
+    return RawVTR(path, coords["x"], coords["y"], coords["z"], cell_data)
+
+
+# writes cells [:, :, k0 : k0 + nk] of a cell array of a raw vtr in place, values: [i, j, nk, (comp)]
+# a k slab is one contiguous byte range, so procs can fill disjoint slabs of a shared file
+def write_raw_vtr_kslab(path, name, k0, values, header=None):
+    header = read_raw_vtr_header(path) if header is None else header
+    nxc, nyc, nzc = header.shape
+    array = header.cell_arrays[name]
+    values = np.asarray(values)
+    if values.shape[:2] != (nxc, nyc) or k0 + values.shape[2] > nzc:
+        raise ValueError(
+            f"Slab of shape {values.shape} at k = {k0} does not fit the {header.shape} cells of {path}"
+        )
+
+    data = values.transpose((2, 1, 0) + tuple(range(3, values.ndim)))
+    data = np.ascontiguousarray(data, dtype=array.dtype)
+    with open(path, "r+b") as f:
+        f.seek(array.offset + k0 * nxc * nyc * array.ncomp * array.dtype.itemsize)
+        f.write(data.tobytes())
+
+
+# a full rectilinear grid mesh written as uncompressed appended raw data
+def write_raw_vtr(mesh, path):
+    nxc, nyc, nzc = (n - 1 for n in mesh.dimensions)
+    cell_arrays = {
+        name: (mesh.cell_data[name].dtype, mesh.cell_data[name].shape[1:])
+        for name in mesh.cell_data
+    }
+    with RawVTRWriter(path, mesh.x, mesh.y, mesh.z, cell_arrays) as writer:
+        for name in cell_arrays:
+            values = mesh.cell_data[name]
+            writer.field(name)[...] = values.reshape(
+                (nxc, nyc, nzc) + values.shape[1:], order="F"
+            )
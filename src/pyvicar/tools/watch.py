@@ -0,0 +1,103 @@
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+import pyvicar.tools.mpi as mpi
+from pyvicar.tools.log import log_host
+from pyvicar.tools.vtk import subvtr_paths
+
+
+def _is_closed(path, tailsize=64):
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        f.seek(max(0, f.tell() - tailsize))
+        return b"</VTKFile>" in f.read()
+
+
+# sizes and mtimes of a vtm and its sub vtrs, None while the vtm cannot be parsed,
+# a sub vtr is missing or any file is not closed by the writer yet
+def frame_snapshot(vtmpath):
+    vtmpath = Path(vtmpath)
+    try:
+        subpaths = subvtr_paths(vtmpath)
+    except (ET.ParseError, FileNotFoundError):
+        return None
+    if not subpaths:
+        return None
+
+    snapshot = []
+    for path in [vtmpath] + subpaths:
+        try:
+            stat = path.stat()
+            if path != vtmpath and not _is_closed(path):
+                return None
+        except FileNotFoundError:
+            return None
+        snapshot.append((stat.st_size, stat.st_mtime_ns))
+
+    return snapshot
+
+
+# polls a vtm list while the solver is still dumping, and converts the frames
+# once they are complete and have not changed for stable_time seconds
+# vtms: VTMList, re-read at every poll
+# convert(vtms): called on all ranks with the list of ready frames
+class DumpWatcher:
+    def __init__(self, vtms, convert, interval=60, stable_time=30):
+        self._vtms = vtms
+        self._convert = convert
+        self._interval = interval
+        self._stable_time = stable_time
+        self._snapshots = {}
+        self._done = set()
+
+    # frames ready since the last poll, decided on host and shared with all ranks
+    def poll(self):
+        self._vtms.read()
+        ready = []
+        if mpi.is_host():
+            now = time.time()
+            for vtm in self._vtms:
+                key = str(vtm.path)
+                if key in self._done:
+                    continue
+
+                snapshot = frame_snapshot(vtm.path)
+                last = self._snapshots.get(key)
+                self._snapshots[key] = snapshot
+                if snapshot is None or snapshot != last:
+                    continue
+
+                newest = max(mtime for _, mtime in snapshot) / 1e9
+                if now - newest >= self._stable_time:
+                    ready.append(key)
+        ready = mpi.comm().bcast(ready, root=0)
+
+        return [vtm for vtm in self._vtms if str(vtm.path) in ready]
+
+    # idle_timeout: stop after no frame was ready for this many seconds, None to run until stop_f
+    # stop_f(): polled on host, True to stop
+    def run(self, idle_timeout=None, stop_f=None):
+        log_host(
+            f"Dump Watch: Watching {self._vtms.case.path / 'FieldsFiles'} every {self._interval}s"
+        )
+        last_ready = time.time()
+        while True:
+            ready = self.poll()
+            if ready:
+                log_host(f"Dump Watch: Converting {len(ready)} frames {ready}")
+                self._convert(ready)
+                self._done.update(str(vtm.path) for vtm in ready)
+                last_ready = time.time()
+
+            stop = False
+            if mpi.is_host():
+                stop = (stop_f is not None and stop_f()) or (
+                    idle_timeout is not None
+                    and time.time() - last_ready >= idle_timeout
+                )
+            if mpi.comm().bcast(stop, root=0):
+                break
+
+            time.sleep(self._interval)
+
+        log_host(f"Dump Watch: Stopped, {len(self._done)} frames converted")